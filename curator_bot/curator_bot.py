@@ -10,14 +10,21 @@ Fonctionnalités :
 """
 
 import os
+import math
+import hashlib
 import sqlite3
+import threading
+import time
+import uuid
 import requests
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
 from typing import Dict, List, Optional, Any
 from fastapi import FastAPI, Request, UploadFile, File, HTTPException
 from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
 
 # ✅ FIX: Charge .env global ET local
 load_dotenv()
@@ -43,6 +50,14 @@ BUNNY_LIBRARY_ID = BUNNY_PRIVATE_LIBRARY_ID
 BUNNY_CDN_HOSTNAME = BUNNY_PRIVATE_CDN_HOSTNAME
 BUNNY_API_BASE = f"https://video.bunnycdn.com/library/{BUNNY_LIBRARY_ID}"
 
+# Bunny sync: page size and max concurrent page fetches (shared by both libraries)
+SYNC_PAGE_SIZE = max(1, int(os.getenv("SYNC_PAGE_SIZE", "100")))
+SYNC_MAX_WORKERS = max(1, int(os.getenv("SYNC_MAX_WORKERS", "4")))
+# Rows buffered before each commit during a sync (5,000 videos -> 5 commits)
+SYNC_COMMIT_ROWS = max(1, int(os.getenv("SYNC_COMMIT_ROWS", "1000")))
+# Finished sync jobs kept in memory for GET /sync/{id}
+SYNC_JOBS_KEEP = max(1, int(os.getenv("SYNC_JOBS_KEEP", "50")))
+
 app = FastAPI(title="Curator Bot", version="1.0")
 
 # Ensure DB directory exists
@@ -154,11 +169,32 @@ def init_db():
     c.execute("CREATE INDEX IF NOT EXISTS idx_videos_status ON videos(status)")
     c.execute("CREATE INDEX IF NOT EXISTS idx_videos_access ON videos(access_level)")
     c.execute("CREATE INDEX IF NOT EXISTS idx_videos_bunny ON videos(bunny_video_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_videos_status_created ON videos(status, created_at)")
+    # Reverse (taxonomy -> video) covering indexes for /videos filters
+    c.execute("CREATE INDEX IF NOT EXISTS idx_video_categories_category ON video_categories(category_id, video_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_video_tags_tag ON video_tags(tag_id, video_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_video_series_series ON video_series(series_id, video_id)")
+    
+    # Columns added after the first release (older DBs)
+    add_missing_columns(c, "videos", {
+        "library_type": "TEXT DEFAULT 'private'",
+        "cdn_hostname": "TEXT",
+        "content_hash": "TEXT",
+        "deleted_at": "TEXT",
+    })
     
     conn.commit()
     conn.close()
 
 
+def add_missing_columns(c, table: str, columns: Dict[str, str]):
+    """Schema migration: add each column not already present in `table`"""
+    existing = {row[1] for row in c.execute(f"PRAGMA table_info({table})")}
+    for name, decl in columns.items():
+        if name not in existing:
+            c.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+
+
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 # BUNNY STREAM API
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
@@ -190,19 +226,35 @@ def bunny_headers(library_type: str = "private"):
     }
 
 
-def fetch_bunny_videos(page: int = 1, items_per_page: int = 100, library_type: str = "private") -> Dict[str, Any]:
-    """Fetch videos from Bunny Stream API"""
+_bunny_sessions: Dict[str, requests.Session] = {}
+_bunny_sessions_lock = threading.Lock()
+
+
+def bunny_session(library_type: str = "private") -> requests.Session:
+    """Pooled keep-alive HTTP session for a library (one per library, shared by sync workers)"""
+    with _bunny_sessions_lock:
+        session = _bunny_sessions.get(library_type)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(bunny_headers(library_type))
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=SYNC_MAX_WORKERS)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _bunny_sessions[library_type] = session
+        return session
+
+
+def fetch_bunny_page(library_type: str = "private", page: int = 1,
+                     items_per_page: int = SYNC_PAGE_SIZE) -> Dict[str, Any]:
+    """Fetch one page of videos from Bunny Stream API (raises on error)"""
     config = get_library_config(library_type)
-    url = f"{config['api_base']}/videos"
-    params = {"page": page, "itemsPerPage": items_per_page}
-    
-    try:
-        response = requests.get(url, headers=bunny_headers(library_type), params=params, timeout=30)
-        response.raise_for_status()
-        return response.json()
-    except Exception as e:
-        print(f"Error fetching Bunny videos ({library_type}): {e}")
-        return {"items": [], "totalItems": 0}
+    response = bunny_session(library_type).get(
+        f"{config['api_base']}/videos",
+        params={"page": page, "itemsPerPage": items_per_page},
+        timeout=30
+    )
+    response.raise_for_status()
+    return response.json()
 
 
 def get_bunny_video(video_id: str, library_type: str = "private") -> Optional[Dict[str, Any]]:
@@ -258,54 +310,90 @@ def now_utc():
     return datetime.now(timezone.utc).isoformat()
 
 
+# Bunny fields that change on every view; left out of the content hash
+BUNNY_VOLATILE_FIELDS = ("views", "averageWatchTime", "totalWatchTime")
+
+_UPSERT_VIDEO_SQL = """
+    INSERT INTO videos (bunny_video_id, guid, title, duration, thumbnail_url,
+                        video_url, cdn_hostname, library_type, bunny_data, content_hash,
+                        created_at, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(bunny_video_id) DO UPDATE SET
+        title = excluded.title,
+        duration = excluded.duration,
+        thumbnail_url = excluded.thumbnail_url,
+        video_url = excluded.video_url,
+        cdn_hostname = excluded.cdn_hostname,
+        library_type = excluded.library_type,
+        bunny_data = excluded.bunny_data,
+        content_hash = excluded.content_hash,
+        status = CASE WHEN videos.deleted_at IS NOT NULL THEN 'active' ELSE videos.status END,
+        deleted_at = NULL,
+        updated_at = excluded.updated_at
+"""
+
+_TOMBSTONE_VIDEO_SQL = """
+    UPDATE videos SET status = 'deleted', deleted_at = ?, updated_at = ?
+    WHERE bunny_video_id = ? AND deleted_at IS NULL
+"""
+
+
+def bunny_content_hash(bunny_video: Dict[str, Any], library_type: str = "private") -> str:
+    """Hash of the Bunny fields we store (view counters excluded)"""
+    relevant = {k: v for k, v in bunny_video.items() if k not in BUNNY_VOLATILE_FIELDS}
+    payload = json.dumps([library_type, get_library_config(library_type)["cdn_hostname"], relevant],
+                         sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def bunny_video_row(bunny_video: Dict[str, Any], library_type: str = "private",
+                    content_hash: Optional[str] = None) -> tuple:
+    """Build the _UPSERT_VIDEO_SQL parameters for a Bunny video"""
+    cdn_hostname = get_library_config(library_type)["cdn_hostname"]
+    bunny_video_id = bunny_video.get("guid")
+    ts = now_utc()
+    if content_hash is None:
+        content_hash = bunny_content_hash(bunny_video, library_type)
+    return (
+        bunny_video_id, bunny_video_id,
+        bunny_video.get("title", "Untitled"),
+        bunny_video.get("length", 0),
+        bunny_video.get("thumbnailFileName", ""),
+        f"https://{cdn_hostname}/{bunny_video_id}/playlist.m3u8",
+        cdn_hostname, library_type, json.dumps(bunny_video), content_hash, ts, ts
+    )
+
+
+def upsert_bunny_rows(conn, rows: List[tuple]) -> int:
+    """Upsert prepared rows in a single transaction (one commit)"""
+    if not rows:
+        return 0
+    try:
+        conn.executemany(_UPSERT_VIDEO_SQL, rows)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(rows)
+
+
+def upsert_bunny_videos(bunny_videos: List[Dict[str, Any]], library_type: str = "private") -> int:
+    """Bulk upsert a page of Bunny videos; returns the number of rows written"""
+    rows = [bunny_video_row(v, library_type) for v in bunny_videos if v.get("guid")]
+    conn = db()
+    try:
+        return upsert_bunny_rows(conn, rows)
+    finally:
+        conn.close()
+
+
 def sync_video_from_bunny(bunny_video: Dict[str, Any], library_type: str = "private") -> int:
     """Sync a video from Bunny Stream to local DB"""
+    upsert_bunny_videos([bunny_video], library_type)
     conn = db()
-    c = conn.cursor()
-    
-    # Add library_type column if it doesn't exist (migration)
-    try:
-        c.execute("ALTER TABLE videos ADD COLUMN library_type TEXT DEFAULT 'private'")
-        conn.commit()
-    except:
-        pass  # Column already exists
-    
-    config = get_library_config(library_type)
-    cdn_hostname = config["cdn_hostname"]
-    
-    bunny_video_id = bunny_video.get("guid")
-    title = bunny_video.get("title", "Untitled")
-    duration = bunny_video.get("length", 0)
-    thumbnail_url = bunny_video.get("thumbnailFileName", "")
-    
-    # Build video URL
-    video_url = f"https://{cdn_hostname}/{bunny_video_id}/playlist.m3u8"
-    
-    # Check if video exists
-    existing = c.execute("SELECT id FROM videos WHERE bunny_video_id = ?", (bunny_video_id,)).fetchone()
-    
-    if existing:
-        # Update
-        c.execute("""
-            UPDATE videos SET 
-                title = ?, duration = ?, thumbnail_url = ?, 
-                video_url = ?, cdn_hostname = ?, library_type = ?, bunny_data = ?, updated_at = ?
-            WHERE bunny_video_id = ?
-        """, (title, duration, thumbnail_url, video_url, cdn_hostname, library_type, json.dumps(bunny_video), now_utc(), bunny_video_id))
-        video_id = existing["id"]
-    else:
-        # Insert
-        c.execute("""
-            INSERT INTO videos (bunny_video_id, guid, title, duration, thumbnail_url, 
-                                video_url, cdn_hostname, library_type, bunny_data, created_at, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (bunny_video_id, bunny_video_id, title, duration, thumbnail_url, 
-              video_url, cdn_hostname, library_type, json.dumps(bunny_video), now_utc(), now_utc()))
-        video_id = c.lastrowid
-    
-    conn.commit()
+    row = conn.execute("SELECT id FROM videos WHERE bunny_video_id = ?", (bunny_video.get("guid"),)).fetchone()
     conn.close()
-    return video_id
+    return row["id"]
 
 
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
@@ -348,11 +436,10 @@ async def startup():
     # Optional auto-sync on startup. Set CURATOR_AUTO_SYNC_ON_STARTUP=true in prod to
     # run a one-time import from Bunny Stream when the service boots.
     try:
-        import asyncio
         if os.environ.get('CURATOR_AUTO_SYNC_ON_STARTUP', '').lower() in ('1', 'true', 'yes'):
             print("[Curator Bot] CURATOR_AUTO_SYNC_ON_STARTUP enabled — launching initial sync...")
-            # Run in background so startup does not block
-            asyncio.create_task(sync_bunny_videos(None))
+            # Background job so startup does not block
+            start_sync_job(["private", "public"])
     except Exception:
         # Non-fatal — if the sync fails we log and continue
         print("[Curator Bot] Failed to start auto-sync (continuing)")
@@ -373,53 +460,253 @@ async def health():
     return {"status": "healthy"}
 
 
-@app.post("/sync/bunny")
-async def sync_bunny_videos(library_type: Optional[str] = None):
-    """Sync videos from Bunny Stream API
-    
-    Args:
-        library_type: "private", "public", or None (sync both)
+def run_bunny_sync(libraries: List[str], progress: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Sync Bunny libraries into the local DB.
+
+    Page 1 of every library is fetched first to read `totalItems`; all the
+    remaining pages of all libraries are then fetched concurrently by a pool
+    of SYNC_MAX_WORKERS threads. Pages are written to SQLite from this thread
+    as they arrive, so sync time follows the slowest page, not the page count.
+    Rows are upserted in bulk, one commit per SYNC_COMMIT_ROWS rows.
+
+    Videos whose content hash matches the stored one are skipped (no write).
+    When every page of a library has been fetched and the listing stayed
+    consistent (same totalItems at the end, all of them seen), videos of that
+    library no longer listed by Bunny are tombstoned (status 'deleted',
+    deleted_at set); a tombstoned video that reappears is restored by the
+    next sync.
+
+    `progress`, when given, is updated in place (pages_total, pages_done,
+    videos, errors) for GET /sync/{id}.
     """
-    libraries_to_sync = []
+    results = {lib: {"added": 0, "updated": 0, "unchanged": 0, "removed": 0} for lib in libraries}
+    seen = {lib: set() for lib in libraries}
+    totals = {}  # totalItems read on page 1
+    failed_pages = []
+    pending = []  # (library, outcome, row) awaiting commit
+    if progress is None:
+        progress = {}
+    progress.update(pages_total=0, pages_done=0, videos=0, errors=failed_pages)
+    conn = db()
     
-    if library_type:
-        libraries_to_sync = [library_type]
-    else:
-        libraries_to_sync = ["private", "public"]
+    # guid -> (content_hash, deleted_at, library_type) as stored before this sync
+    known = {
+        row["bunny_video_id"]: (row["content_hash"], row["deleted_at"], row["library_type"])
+        for row in conn.execute(
+            "SELECT bunny_video_id, content_hash, deleted_at, library_type FROM videos "
+            "WHERE bunny_video_id IS NOT NULL"
+        )
+    }
     
-    total_synced = 0
-    results = {}
+    def flush():
+        try:
+            upsert_bunny_rows(conn, [row for _, _, row in pending])
+            for lib, outcome, _ in pending:
+                results[lib][outcome] += 1
+        except Exception as e:
+            print(f"[Sync] Failed to write {len(pending)} videos: {e}")
+        pending.clear()
+    
+    def store(lib: str, videos: List[Dict[str, Any]]):
+        for video in videos:
+            guid = video.get("guid")
+            if not guid:
+                continue
+            seen[lib].add(guid)
+            content_hash = bunny_content_hash(video, lib)
+            previous = known.get(guid)
+            if previous and previous[0] == content_hash and previous[1] is None:
+                results[lib]["unchanged"] += 1
+                continue
+            known[guid] = (content_hash, None, lib)
+            pending.append((lib, "updated" if previous else "added", bunny_video_row(video, lib, content_hash)))
+        progress["videos"] = sum(len(guids) for guids in seen.values())
+        if len(pending) >= SYNC_COMMIT_ROWS:
+            flush()
+    
+    def tombstone(lib: str):
+        if any(f["library"] == lib for f in failed_pages):
+            print(f"[Sync] {lib.upper()}: incomplete listing, removal detection skipped")
+            return
+        gone = [guid for guid, (_, deleted_at, owner) in known.items()
+                if owner == lib and deleted_at is None and guid not in seen[lib]]
+        if not gone:
+            return
+        # Pages are read at different times: a deletion (or upload) on Bunny
+        # mid-sync shifts later pages and hides a live video. Only trust the
+        # listing if totalItems is unchanged and every item was seen.
+        try:
+            total_now = int(fetch_bunny_page(lib, 1).get("totalItems") or 0)
+        except Exception as e:
+            print(f"[Sync] {lib.upper()}: cannot re-read totalItems ({e}), removal detection skipped")
+            return
+        if total_now != totals.get(lib) or len(seen[lib]) != total_now:
+            print(f"[Sync] {lib.upper()}: listing changed during sync "
+                  f"(totalItems {totals.get(lib)} -> {total_now}, seen {len(seen[lib])}), "
+                  f"removal detection skipped")
+            return
+        ts = now_utc()
+        try:
+            conn.executemany(_TOMBSTONE_VIDEO_SQL, [(ts, ts, guid) for guid in gone])
+            conn.commit()
+            results[lib]["removed"] += len(gone)
+        except Exception as e:
+            conn.rollback()
+            print(f"[Sync] {lib.upper()}: failed to tombstone {len(gone)} videos: {e}")
     
-    for lib_type in libraries_to_sync:
-        print(f"[Sync] Starting {lib_type.upper()} library sync...")
-        lib_synced = 0
-        page = 1
-        
-        while True:
-            result = fetch_bunny_videos(page=page, library_type=lib_type)
-            videos = result.get("items", [])
-            
-            if not videos:
-                break
-            
-            for video in videos:
+    try:
+        with ThreadPoolExecutor(max_workers=SYNC_MAX_WORKERS, thread_name_prefix="bunny-sync") as pool:
+            first_pages = {pool.submit(fetch_bunny_page, lib, 1): lib for lib in libraries}
+            remaining = {}
+            for future in as_completed(first_pages):
+                lib = first_pages[future]
+                progress["pages_done"] += 1
                 try:
-                    sync_video_from_bunny(video, library_type=lib_type)
-                    lib_synced += 1
-                    total_synced += 1
+                    data = future.result()
                 except Exception as e:
-                    print(f"Error syncing video {video.get('guid')} ({lib_type}): {e}")
+                    print(f"[Sync] {lib.upper()} page 1 failed: {e}")
+                    failed_pages.append({"library": lib, "page": 1, "error": str(e)[:300]})
+                    progress["pages_total"] += 1
+                    continue
+                totals[lib] = int(data.get("totalItems") or 0)
+                pages = max(1, math.ceil(totals[lib] / SYNC_PAGE_SIZE))
+                progress["pages_total"] += pages
+                print(f"[Sync] {lib.upper()}: {data.get('totalItems', 0)} videos, {pages} page(s)")
+                for page in range(2, pages + 1):
+                    remaining[pool.submit(fetch_bunny_page, lib, page)] = (lib, page)
+                store(lib, data.get("items", []))
             
-            # Check if more pages
-            if len(videos) < 100:
-                break
-            page += 1
-        
-        results[lib_type] = lib_synced
-        print(f"[Sync] {lib_type.upper()} completed: {lib_synced} videos")
+            for future in as_completed(remaining):
+                lib, page = remaining[future]
+                progress["pages_done"] += 1
+                try:
+                    store(lib, future.result().get("items", []))
+                except Exception as e:
+                    print(f"[Sync] {lib.upper()} page {page} failed: {e}")
+                    failed_pages.append({"library": lib, "page": page, "error": str(e)[:300]})
+        flush()
+        for lib in libraries:
+            tombstone(lib)
+    finally:
+        conn.close()
     
-    print(f"[Sync] Total synced: {total_synced} videos")
-    return {"ok": True, "total_synced": total_synced, "details": results}
+    totals = {k: sum(r[k] for r in results.values()) for k in ("added", "updated", "unchanged", "removed")}
+    for lib, counts in results.items():
+        print(f"[Sync] {lib.upper()} completed: {counts}")
+    total_synced = sum(len(guids) for guids in seen.values())
+    print(f"[Sync] Total synced: {total_synced} videos ({totals})")
+    return {"ok": True, "total_synced": total_synced, **totals,
+            "details": results, "failed_pages": failed_pages}
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# SYNC JOBS
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+_sync_jobs: Dict[str, Dict[str, Any]] = {}
+_sync_jobs_lock = threading.Lock()
+
+
+def start_sync_job(libraries: List[str]):
+    """Start a background Bunny sync, or join a running one covering `libraries`.
+
+    Returns (job, coalesced).
+    """
+    with _sync_jobs_lock:
+        for job in _sync_jobs.values():
+            if job["status"] == "running" and set(libraries) <= set(job["libraries"]):
+                return job, True
+        job = {
+            "id": uuid.uuid4().hex[:12],
+            "status": "running",
+            "libraries": list(libraries),
+            "started_at": now_utc(),
+            "finished_at": None,
+            "pages_total": 0,
+            "pages_done": 0,
+            "videos": 0,
+            "errors": [],
+            "result": None,
+            "_t0": time.monotonic(),
+            "_t1": None,
+        }
+        _sync_jobs[job["id"]] = job
+        finished = [j["id"] for j in _sync_jobs.values() if j["status"] != "running"]
+        for job_id in finished[:max(0, len(finished) - SYNC_JOBS_KEEP)]:
+            del _sync_jobs[job_id]
+    threading.Thread(target=_run_sync_job, args=(job,), name=f"bunny-sync-{job['id']}", daemon=True).start()
+    print(f"[Sync] Job {job['id']} started: {', '.join(libraries)}")
+    return job, False
+
+
+def _run_sync_job(job: Dict[str, Any]):
+    try:
+        result = run_bunny_sync(job["libraries"], progress=job)
+        job.update(result=result, status="done")
+    except Exception as e:
+        print(f"[Sync] Job {job['id']} failed: {e}")
+        job["errors"] = list(job["errors"]) + [{"error": str(e)[:300]}]
+        job["status"] = "failed"
+    finally:
+        job["_t1"] = time.monotonic()
+        job["finished_at"] = now_utc()
+
+
+def sync_job_view(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Public snapshot of a sync job (progress + rate)"""
+    with _sync_jobs_lock:
+        view = {k: v for k, v in job.items() if not k.startswith("_")}
+        view["errors"] = list(job["errors"])
+        elapsed = (job["_t1"] or time.monotonic()) - job["_t0"]
+    view["elapsed_sec"] = round(elapsed, 2)
+    view["videos_per_sec"] = round(job["videos"] / elapsed, 1) if elapsed > 0 else 0.0
+    return view
+
+
+@app.post("/sync/bunny", status_code=202)
+async def sync_bunny_videos(library_type: Optional[str] = None):
+    """Start a Bunny sync in the background; poll GET /sync/{id} for progress
+    
+    Args:
+        library_type: "private", "public", or None (sync both)
+    """
+    libraries_to_sync = [library_type] if library_type else ["private", "public"]
+    job, coalesced = start_sync_job(libraries_to_sync)
+    return {
+        "ok": True,
+        "sync_id": job["id"],
+        "status": job["status"],
+        "coalesced": coalesced,
+        "status_url": f"/sync/{job['id']}"
+    }
+
+
+@app.get("/sync/{sync_id}")
+async def get_sync_job(sync_id: str):
+    """Progress of a background Bunny sync"""
+    job = _sync_jobs.get(sync_id)
+    if not job:
+        raise HTTPException(status_code=404, detail={"error": f"Sync {sync_id} not found"})
+    return sync_job_view(job)
+
+
+# Filter name -> (association table, foreign key, lookup table)
+TAXONOMY_FILTERS = {
+    "category": ("video_categories", "category_id", "categories"),
+    "tag": ("video_tags", "tag_id", "tags"),
+    "series": ("video_series", "series_id", "series"),
+}
+
+
+def taxonomy_filter(kind: str, value: Any):
+    """(association table, key condition, params) for one category/tag/series.
+
+    `value` is an id, or a slug/name resolved through the lookup table.
+    """
+    link, key, lookup = TAXONOMY_FILTERS[kind]
+    if isinstance(value, int) or str(value).isdigit():
+        return link, f"{key} = ?", [int(value)]
+    return link, f"{key} IN (SELECT id FROM {lookup} WHERE slug = ? OR name = ?)", [value, value]
 
 
 @app.get("/videos")
@@ -430,30 +717,54 @@ async def list_videos(
     tag: Optional[str] = None,
     series: Optional[str] = None,
     access: Optional[str] = None,
-    library: Optional[str] = None
+    library: Optional[str] = None,
+    category_id: Optional[int] = None,
+    tag_id: Optional[int] = None,
+    series_id: Optional[int] = None
 ):
     """List videos with filters
     
     Args:
+        category, tag, series: id, slug or name
+        category_id, tag_id, series_id: id (as sent by public_interface)
         library: "private" or "public" to filter by library type
     """
     conn = db()
     c = conn.cursor()
     
-    query = "SELECT * FROM videos WHERE status = 'active'"
+    filters = [
+        taxonomy_filter(kind, value)
+        for kind, value in (("category", category), ("category", category_id),
+                            ("tag", tag), ("tag", tag_id),
+                            ("series", series), ("series", series_id))
+        if value is not None and value != ""
+    ]
     params = []
     
+    if filters:
+        # The first filter drives the scan through its reverse covering index
+        # (e.g. category_id, video_id): cost follows the matching videos, not
+        # the catalog size. CROSS JOIN pins that join order in SQLite.
+        link, condition, values = filters.pop(0)
+        query = (f"SELECT videos.* FROM {link} AS f CROSS JOIN videos ON videos.id = f.video_id "
+                 f"WHERE f.{condition} AND videos.status = 'active'")
+        params.extend(values)
+    else:
+        query = "SELECT videos.* FROM videos WHERE videos.status = 'active'"
+    
+    for link, condition, values in filters:
+        query += f" AND videos.id IN (SELECT video_id FROM {link} WHERE {condition})"
+        params.extend(values)
+    
     if access:
-        query += " AND access_level = ?"
+        query += " AND videos.access_level = ?"
         params.append(access)
     
     if library:
-        query += " AND library_type = ?"
+        query += " AND videos.library_type = ?"
         params.append(library)
     
-    # TODO: Add category/tag/series filtering with JOINs
-    
-    query += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
+    query += " ORDER BY videos.created_at DESC LIMIT ? OFFSET ?"
     params.extend([limit, offset])
     
     rows = c.execute(query, params).fetchall()
@@ -475,7 +786,7 @@ async def get_video(video_id: int):
                video_url, cdn_hostname, access_level, library_type,
                views, created_at
         FROM videos
-        WHERE id = ?
+        WHERE id = ? AND deleted_at IS NULL
     """, (video_id,))
     
     row = cursor.fetchone()
@@ -1,14 +1,27 @@
 import os
 import json
+import asyncio
+import hashlib
+import random
 import sqlite3
 import threading
+import math
 import time
-from datetime import datetime
-from typing import Optional, Dict, Any
-from fastapi import FastAPI, Request, HTTPException
+import uuid
+import zlib
+from collections import deque
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+from typing import Optional, Dict, Any, Iterable, List
+from fastapi import FastAPI, Request, Response, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
+from fastapi.concurrency import run_in_threadpool
 from dotenv import load_dotenv
 import requests
-from tenacity import retry, wait_fixed, stop_after_attempt
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
 
 load_dotenv()
 
@@ -16,7 +29,107 @@ PORT = int(os.getenv("PORT", "5055"))
 NARRATOR_URL = os.getenv("NARRATOR_URL", "http://localhost:5056/describe")
 BUILDER_URL = os.getenv("BUILDER_URL", "http://localhost:5057/build")
 PUBLISHER_URL = os.getenv("PUBLISHER_URL", "http://localhost:5058/notify")
+PUBLISHER_SOCIAL_URL = os.getenv(
+    "PUBLISHER_SOCIAL_URL", PUBLISHER_URL.replace("/notify", "/social/publish")
+)
 WORKER_INTERVAL = int(os.getenv("WORKER_INTERVAL_SEC", "2"))
+# Nombre de workers par étape (valeur par défaut des *_CONCURRENCY)
+WORKER_CONCURRENCY = max(1, int(os.getenv("WORKER_CONCURRENCY", "4")))
+NARRATOR_CONCURRENCY = max(1, int(os.getenv("NARRATOR_CONCURRENCY", WORKER_CONCURRENCY)))
+BUILDER_CONCURRENCY = max(1, int(os.getenv("BUILDER_CONCURRENCY", WORKER_CONCURRENCY)))
+PUBLISHER_CONCURRENCY = max(1, int(os.getenv("PUBLISHER_CONCURRENCY", WORKER_CONCURRENCY)))
+
+# Étape de téléchargement : les entrées distantes (URL) sont copiées dans le
+# scratch local avant le Narrator (qui n'accepte qu'un chemin local).
+# Requêtes Range en parallèle si le serveur les accepte, LRU borné en taille.
+DOWNLOADER_CONCURRENCY = max(1, int(os.getenv("DOWNLOADER_CONCURRENCY", "2")))
+DOWNLOAD_DIR = os.path.abspath(os.getenv("DOWNLOAD_DIR", "./scratch"))
+DOWNLOAD_PARTS = max(1, int(os.getenv("DOWNLOAD_PARTS", "4")))
+DOWNLOAD_CHUNK_BYTES = max(1024 * 1024, int(os.getenv("DOWNLOAD_CHUNK_BYTES", str(8 * 1024 * 1024))))
+SCRATCH_MAX_BYTES = max(0, int(os.getenv("SCRATCH_MAX_BYTES", str(20 * 1024 ** 3))))
+DOWNLOAD_CONNECT_TIMEOUT_SEC = float(os.getenv("DOWNLOAD_CONNECT_TIMEOUT_SEC", "10"))
+DOWNLOAD_READ_TIMEOUT_SEC = float(os.getenv("DOWNLOAD_READ_TIMEOUT_SEC", "60"))
+
+# Limites par service en aval, partagées par tous les workers du process :
+# débit (requêtes/s, 0 = illimité) et requêtes simultanées max
+NARRATOR_RPS = max(0.0, float(os.getenv("NARRATOR_RPS", "0")))
+NARRATOR_MAX_IN_FLIGHT = max(1, int(os.getenv("NARRATOR_MAX_IN_FLIGHT", NARRATOR_CONCURRENCY)))
+BUILDER_RPS = max(0.0, float(os.getenv("BUILDER_RPS", "0")))
+BUILDER_MAX_IN_FLIGHT = max(1, int(os.getenv("BUILDER_MAX_IN_FLIGHT", BUILDER_CONCURRENCY)))
+PUBLISHER_RPS = max(0.0, float(os.getenv("PUBLISHER_RPS", "0")))
+PUBLISHER_MAX_IN_FLIGHT = max(1, int(os.getenv("PUBLISHER_MAX_IN_FLIGHT", PUBLISHER_CONCURRENCY)))
+
+# Timeouts HTTP par étape (secondes) : connexion / lecture de la réponse
+HTTP_CONNECT_TIMEOUT_SEC = float(os.getenv("HTTP_CONNECT_TIMEOUT_SEC", "10"))
+NARRATOR_CONNECT_TIMEOUT_SEC = float(os.getenv("NARRATOR_CONNECT_TIMEOUT_SEC", HTTP_CONNECT_TIMEOUT_SEC))
+NARRATOR_READ_TIMEOUT_SEC = float(os.getenv("NARRATOR_READ_TIMEOUT_SEC", "60"))
+BUILDER_CONNECT_TIMEOUT_SEC = float(os.getenv("BUILDER_CONNECT_TIMEOUT_SEC", HTTP_CONNECT_TIMEOUT_SEC))
+BUILDER_READ_TIMEOUT_SEC = float(os.getenv("BUILDER_READ_TIMEOUT_SEC", "120"))
+PUBLISHER_CONNECT_TIMEOUT_SEC = float(os.getenv("PUBLISHER_CONNECT_TIMEOUT_SEC", HTTP_CONNECT_TIMEOUT_SEC))
+PUBLISHER_READ_TIMEOUT_SEC = float(os.getenv("PUBLISHER_READ_TIMEOUT_SEC", "10"))
+PUBLISHER_SOCIAL_READ_TIMEOUT_SEC = float(os.getenv("PUBLISHER_SOCIAL_READ_TIMEOUT_SEC", "300"))
+
+# Cache narrator : empreinte du fichier → narrator_json (re-uploads, doublons)
+NARRATOR_CACHE_ENABLED = os.getenv("NARRATOR_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+FINGERPRINT_SAMPLE_BYTES = max(4096, int(os.getenv("FINGERPRINT_SAMPLE_BYTES", str(1024 * 1024))))
+
+# Flux SSE des transitions de jobs (/jobs/stream)
+JOB_EVENTS_RETENTION = max(1000, int(os.getenv("JOB_EVENTS_RETENTION", "100000")))
+STREAM_KEEPALIVE_SEC = float(os.getenv("STREAM_KEEPALIVE_SEC", "15"))
+
+# Pagination de /jobs
+MAX_JOBS_PAGE = max(1, int(os.getenv("MAX_JOBS_PAGE", "500")))
+
+# Ingestion par lots (/events/batch)
+MAX_BATCH_EVENTS = max(1, int(os.getenv("MAX_BATCH_EVENTS", "1000")))
+
+# Lanes de priorité : poids du scheduler équitable (smooth weighted round-robin)
+# entre les lanes qui ont du travail. Dans une lane : priority DESC puis FIFO.
+def _parse_lanes(spec: str) -> Dict[str, int]:
+    lanes: Dict[str, int] = {}
+    for part in spec.split(","):
+        name, _, weight = part.strip().partition(":")
+        if name.strip():
+            lanes[name.strip()] = max(1, int(weight or 1))
+    return lanes
+
+
+LANE_WEIGHTS = _parse_lanes(os.getenv("LANE_WEIGHTS", "manual_upload:8,default:4,resync:2,backfill:1"))
+DEFAULT_LANE = os.getenv("DEFAULT_LANE", "default")
+LANE_WEIGHTS.setdefault(DEFAULT_LANE, 1)
+
+# Admission control de /event et /events/batch (0 = pas de limite) :
+# profondeur max de la file (globale et par lane) et débit par source.
+# Au-delà : 429 + Retry-After estimé sur le débit de vidage observé.
+MAX_QUEUE_DEPTH = max(0, int(os.getenv("MAX_QUEUE_DEPTH", "5000")))
+LANE_MAX_DEPTH = _parse_lanes(os.getenv("LANE_MAX_DEPTH", ""))
+SOURCE_RATE_PER_SEC = max(0.0, float(os.getenv("SOURCE_RATE_PER_SEC", "100")))
+# Par défaut la réserve couvre un batch plein (MAX_BATCH_EVENTS jetons)
+SOURCE_BURST = max(1, int(os.getenv("SOURCE_BURST", str(MAX_BATCH_EVENTS))))
+DRAIN_WINDOW_SEC = max(1.0, float(os.getenv("DRAIN_WINDOW_SEC", "300")))
+RETRY_AFTER_MAX_SEC = max(1, int(os.getenv("RETRY_AFTER_MAX_SEC", "600")))
+
+# Retries des étapes : backoff exponentiel + jitter, sans bloquer de worker
+JOB_MAX_ATTEMPTS = max(1, int(os.getenv("JOB_MAX_ATTEMPTS", "5")))
+JOB_RETRY_BASE_SEC = float(os.getenv("JOB_RETRY_BASE_SEC", "2"))
+JOB_RETRY_MAX_SEC = float(os.getenv("JOB_RETRY_MAX_SEC", "300"))
+
+# Leases : un job réservé appartient à son worker tant que celui-ci renouvelle
+# le lease (heartbeat). Un lease expiré (process mort) remet le job en file.
+JOB_LEASE_SEC = float(os.getenv("JOB_LEASE_SEC", "60"))
+HEARTBEAT_INTERVAL = JOB_LEASE_SEC / 3
+
+# Outbox des notifications Publisher (livraison hors du chemin critique)
+OUTBOX_BATCH_SIZE = max(1, int(os.getenv("OUTBOX_BATCH_SIZE", "20")))
+OUTBOX_MAX_ATTEMPTS = max(1, int(os.getenv("OUTBOX_MAX_ATTEMPTS", "12")))
+OUTBOX_RETRY_BASE_SEC = float(os.getenv("OUTBOX_RETRY_BASE_SEC", "5"))
+OUTBOX_RETRY_MAX_SEC = float(os.getenv("OUTBOX_RETRY_MAX_SEC", "900"))
+
+# Archivage : les jobs terminés depuis ARCHIVE_AFTER_DAYS jours quittent la
+# table chaude `jobs` pour `jobs_archive` (JSON compressé). 0 = désactivé.
+ARCHIVE_AFTER_DAYS = max(0.0, float(os.getenv("ARCHIVE_AFTER_DAYS", "30")))
+ARCHIVE_INTERVAL_SEC = max(60.0, float(os.getenv("ARCHIVE_INTERVAL_SEC", "3600")))
+ARCHIVE_BATCH_SIZE = max(1, int(os.getenv("ARCHIVE_BATCH_SIZE", "500")))
 
 DB_PATH = os.getenv("DB_PATH", "./gateway.db")
 # Créer le dossier parent si nécessaire (pour Render sans Disk)
@@ -24,57 +137,425 @@ os.makedirs(os.path.dirname(DB_PATH) if os.path.dirname(DB_PATH) else ".", exist
 
 app = FastAPI(title="OM43 Gateway", version="1.0")
 
+# Pipeline : chaque étape a sa propre file (statut d'entrée), un statut
+# "en cours" pendant l'appel au service, un statut de sortie et son propre
+# nombre de workers. Le narrator du job N+1 tourne pendant le build du job N.
+# La publication ne bloque plus de worker : la transaction qui passe le job
+# en 'done' écrit les notifications dans l'outbox, livrée à part.
+STAGES: Dict[str, Dict[str, Any]] = {
+    # Entrées distantes uniquement : les fichiers locaux entrent directement en 'queued'
+    "downloader": {"input": "download_queued", "running": "downloading", "output": "queued",
+                   "concurrency": DOWNLOADER_CONCURRENCY},
+    "narrator": {"input": "queued", "running": "narrating", "output": "narrated",
+                 "concurrency": NARRATOR_CONCURRENCY},
+    "builder": {"input": "narrated", "running": "building", "output": "done",
+                "concurrency": BUILDER_CONCURRENCY},
+}
+STAGE_BY_INPUT = {cfg["input"]: name for name, cfg in STAGES.items()}
+TERMINAL_STATUSES = ("done", "error")
+# Statuts "en file" (profondeur de la queue) : files et étapes en cours
+ACTIVE_STATUSES = tuple(s for cfg in STAGES.values() for s in (cfg["input"], cfg["running"]))
+
+# Réveil des workers : chaque ajout dans la file d'une étape incrémente sa
+# séquence et notifie sa condition. Le polling (WORKER_INTERVAL) ne reste
+# qu'en filet de sécurité.
+_stage_cv = {name: threading.Condition() for name in STAGES}
+_stage_seq = {name: 0 for name in STAGES}
+# Crédits du round-robin pondéré, par étape et par lane
+_lane_credit: Dict[str, Dict[str, int]] = {name: {} for name in STAGES}
+_lane_lock = threading.Lock()
+_outbox_wakeup = threading.Event()
+# Leases détenus par ce process (job_id → claim_token), renouvelés par heartbeat
+_leases: Dict[int, str] = {}
+_leases_lock = threading.Lock()
+_shutdown = threading.Event()
+_workers: list = []
+
+# Empreintes déjà calculées : (path, size, mtime_ns) → fingerprint
+_fingerprints: Dict[tuple, str] = {}
+_cache_stats = {"hits": 0, "misses": 0, "bypassed": 0}
+_cache_lock = threading.Lock()
+
+# Admission : sorties de file récentes (ts, lane) et token buckets par source
+_drained: deque = deque()
+_sources: Dict[str, "TokenBucket"] = {}
+_admission_lock = threading.Lock()
+_admission_stats = {"accepted": 0, "rate_limited": 0, "too_large": 0, "queue_full": 0}
+
+# Abonnés SSE : (boucle asyncio, Event) réveillés après chaque commit qui
+# a enregistré des job_events
+_stream_subscribers: set = set()
+_stream_lock = threading.Lock()
+
 
 # ---------------- DB utils ----------------
-def db():
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+# Une connexion par thread, réutilisée : WAL (les lectures de /jobs ne
+# bloquent plus les écritures des workers), synchronous=NORMAL, et un cache
+# de requêtes préparées (sqlite3 réutilise le statement compilé pour un même
+# texte SQL, d'où les requêtes chaudes en constantes).
+_local = threading.local()
+SQLITE_BUSY_TIMEOUT_SEC = float(os.getenv("SQLITE_BUSY_TIMEOUT_SEC", "10"))
+
+
+class _Connection(sqlite3.Connection):
+    """Connexion qui réveille les flux SSE après un commit ayant écrit des job_events.
+
+    Les job_events sont écrits par triggers ; après chaque transaction
+    d'écriture validée, on compare le dernier id au dernier id vu.
+    """
+    
+    _changes_seen = 0
+    _events_seen = 0
+    
+    def __exit__(self, exc_type, exc, tb):
+        result = super().__exit__(exc_type, exc, tb)
+        if exc_type is None and self.total_changes != self._changes_seen:
+            self._changes_seen = self.total_changes
+            if _stream_subscribers:
+                try:
+                    latest = self.execute("SELECT MAX(id) FROM job_events").fetchone()[0] or 0
+                except sqlite3.OperationalError:
+                    latest = 0
+                if latest > self._events_seen:
+                    self._events_seen = latest
+                    publish_job_events()
+        return result
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(
+        path, check_same_thread=False,
+        timeout=SQLITE_BUSY_TIMEOUT_SEC, cached_statements=256,
+        factory=_Connection
+    )
     conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-16000")
+    return conn
+
+
+def db() -> sqlite3.Connection:
+    """Connexion SQLite du thread courant (créée au premier appel).
+
+    À utiliser avec `with db() as c:` : le bloc commit (ou rollback) sans
+    fermer la connexion.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.path != DB_PATH:
+        if conn is not None:
+            conn.close()
+        conn = _connect(DB_PATH)
+        _local.conn, _local.path = conn, DB_PATH
     return conn
 
 
+def _ensure_column(c: sqlite3.Connection, table: str, column: str, decl: str):
+    """Ajoute une colonne si elle n'existe pas encore (DB existantes)"""
+    cols = {r["name"] for r in c.execute(f"PRAGMA table_info({table})")}
+    if column not in cols:
+        c.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+# --------------- Schema ---------------
+# Schéma versionné (PRAGMA user_version) : chaque migration s'exécute une
+# seule fois, dans sa propre transaction. La v1 est idempotente : elle amène
+# au même état les bases créées avant le versionnement.
+def _schema_v1(c: sqlite3.Connection):
+    """Schéma de base : jobs, job_events, outbox, narrator_cache, jobs_archive"""
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS jobs(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            file TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            narrator_json TEXT,
+            post_id INTEGER,
+            link TEXT,
+            last_error TEXT,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+    """)
+    # Migration: colonnes de claim pour le pool de workers
+    _ensure_column(c, "jobs", "claim_token", "TEXT")
+    _ensure_column(c, "jobs", "claimed_at", "TEXT")
+    # Migration: retries planifiés (epoch) au lieu de sleeps dans le worker
+    _ensure_column(c, "jobs", "attempts", "INTEGER NOT NULL DEFAULT 0")
+    _ensure_column(c, "jobs", "next_attempt_at", "REAL NOT NULL DEFAULT 0")
+    # Migration: leases + heartbeat (epoch) pour la reprise après crash
+    _ensure_column(c, "jobs", "lease_expires_at", "REAL")
+    _ensure_column(c, "jobs", "heartbeat_at", "REAL")
+    # Ancien statut du worker unique : sans lease, on remet en file
+    c.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'")
+    # Migration: clé d'idempotence des événements (unique si fournie)
+    _ensure_column(c, "jobs", "idempotency_key", "TEXT")
+    # Migration: lanes + priorité (scheduler équitable)
+    _ensure_column(c, "jobs", "lane", f"TEXT NOT NULL DEFAULT '{DEFAULT_LANE}'")
+    _ensure_column(c, "jobs", "priority", "INTEGER NOT NULL DEFAULT 0")
+    # Migration: instrumentation (epoch d'entrée en file + timings JSON)
+    _ensure_column(c, "jobs", "enqueued_at", "REAL")
+    _ensure_column(c, "jobs", "timings", "TEXT")
+    # Migration: empreinte du fichier source (cache narrator)
+    _ensure_column(c, "jobs", "fingerprint", "TEXT")
+    # Migration: copie locale d'une entrée distante (étape downloader)
+    _ensure_column(c, "jobs", "local_path", "TEXT")
+    _ensure_column(c, "jobs", "checksum", "TEXT")
+    _ensure_column(c, "jobs", "source_size", "INTEGER")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_jobs_file ON jobs(file)")
+    c.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_idempotency
+        ON jobs(idempotency_key) WHERE idempotency_key IS NOT NULL
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_jobs_due ON jobs(status, next_attempt_at)")
+    c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_jobs_lane
+        ON jobs(status, lane, priority DESC, next_attempt_at)
+    """)
+    # Pagination keyset de /jobs (par statut, par id ou par date de modification)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_id ON jobs(status, id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_updated ON jobs(status, updated_at)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_jobs_updated ON jobs(updated_at)")
+    
+    # Journal des transitions de statut (flux SSE), alimenté par triggers
+    # pour couvrir tous les chemins d'écriture (insert, claim, reaper...)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS job_events(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            file TEXT,
+            attempts INTEGER,
+            post_id INTEGER,
+            link TEXT,
+            last_error TEXT,
+            created_at TEXT NOT NULL
+        )
+    """)
+    for trigger, event in (("trg_jobs_event_insert", "AFTER INSERT ON jobs"),
+                           ("trg_jobs_event_status", "AFTER UPDATE OF status ON jobs")):
+        guard = "" if "INSERT" in event else "WHEN NEW.status IS NOT OLD.status"
+        c.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {trigger} {event} {guard}
+            BEGIN
+                INSERT INTO job_events(job_id, status, file, attempts, post_id, link, last_error, created_at)
+                VALUES (NEW.id, NEW.status, NEW.file, NEW.attempts, NEW.post_id, NEW.link,
+                        NEW.last_error, NEW.updated_at);
+            END
+        """)
+    
+    # Outbox : notifications Publisher à livrer (écrites avec le 'done')
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS outbox(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            last_error TEXT,
+            created_at TEXT NOT NULL,
+            sent_at TEXT
+        )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox(status, next_attempt_at)")
+    
+    # Cache narrator : résultats réutilisés pour un contenu identique
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS narrator_cache(
+            fingerprint TEXT PRIMARY KEY,
+            narrator_json TEXT NOT NULL,
+            hits INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL,
+            last_hit_at TEXT
+        )
+    """)
+    # Archive froide : jobs terminés retirés de `jobs`. Colonnes utiles à
+    # l'affichage en clair, ligne complète en JSON compressé (zlib).
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS jobs_archive(
+            id INTEGER PRIMARY KEY,
+            file TEXT NOT NULL,
+            status TEXT NOT NULL,
+            lane TEXT,
+            post_id INTEGER,
+            link TEXT,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            archived_at TEXT NOT NULL,
+            data BLOB NOT NULL
+        )
+    """)
+
+
+def _schema_v2(c: sqlite3.Connection):
+    """Événement d'origine typé (JobEvent) : type, titre et horodatage de l'appelant"""
+    _ensure_column(c, "jobs", "event", "TEXT")
+    _ensure_column(c, "jobs", "title", "TEXT")
+    _ensure_column(c, "jobs", "event_ts", "TEXT")
+
+
+def _schema_v3(c: sqlite3.Connection):
+    """Éligibilité par lane indexée (status, lane, next_attempt_at) : les
+    jobs en backoff sont sautés par l'index au lieu d'être parcourus"""
+    c.execute("CREATE INDEX IF NOT EXISTS idx_jobs_lane_due ON jobs(status, lane, next_attempt_at)")
+
+
+MIGRATIONS = [_schema_v1, _schema_v2, _schema_v3]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
 def init_db():
+    for version, migrate in enumerate(MIGRATIONS, start=1):
+        with db() as c:
+            # Verrou d'écriture avant de relire la version : deux process qui
+            # démarrent ensemble n'appliquent pas deux fois la même migration
+            c.execute("BEGIN IMMEDIATE")
+            if c.execute("PRAGMA user_version").fetchone()[0] >= version:
+                continue
+            migrate(c)
+            c.execute(f"PRAGMA user_version = {version}")
+            print(f"[DB] schema migrated to v{version}")
     with db() as c:
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS jobs(
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                file TEXT NOT NULL,
-                status TEXT NOT NULL DEFAULT 'queued',
-                narrator_json TEXT,
-                post_id INTEGER,
-                link TEXT,
-                last_error TEXT,
-                created_at TEXT NOT NULL,
-                updated_at TEXT NOT NULL
-            )
-        """)
-        c.execute("CREATE INDEX IF NOT EXISTS idx_jobs_file ON jobs(file)")
-    print(f"[DB] ready: {DB_PATH}")
+        # Livraisons interrompues par un arrêt du process : on les rejoue
+        c.execute("UPDATE outbox SET status = 'pending' WHERE status = 'sending'")
+    print(f"[DB] ready: {DB_PATH} (schema v{SCHEMA_VERSION})")
 
 
 def now():
-    return datetime.utcnow().isoformat(timespec="seconds")
+    return datetime.utcnow().isoformat(timespec="milliseconds")
+
+
+def resolve_lane(event: Dict[str, Any]) -> str:
+    """Lane d'un événement : `lane` explicite, sinon le type d'événement s'il
+    correspond à une lane (ex. manual_upload), sinon DEFAULT_LANE."""
+    lane = event.get("lane")
+    if lane:
+        if lane not in LANE_WEIGHTS:
+            raise ValueError(f"Unknown lane '{lane}' (lanes: {', '.join(LANE_WEIGHTS)})")
+        return lane
+    if event.get("event") in LANE_WEIGHTS:
+        return event["event"]
+    return DEFAULT_LANE
+
+
+def is_remote(path: str) -> bool:
+    return str(path).lower().startswith(("http://", "https://"))
+
+
+def entry_stage(path: str) -> str:
+    """Première étape d'un job : téléchargement pour une URL, sinon Narrator"""
+    return "downloader" if is_remote(path) else "narrator"
+
+
+@dataclass
+class JobEvent:
+    """Événement d'ingestion validé : forme unique des jobs créés par /event,
+    /events/batch et les requeues internes"""
+    event: str
+    file: str
+    title: Optional[str] = None
+    lane: str = DEFAULT_LANE
+    priority: int = 0
+    idempotency_key: Optional[str] = None
+    event_ts: Optional[str] = None
+    
+    @classmethod
+    def from_payload(cls, data: Any) -> "JobEvent":
+        """Valide un payload JSON ; lève ValueError si invalide"""
+        if not isinstance(data, dict) or not data.get("event") or not data.get("file"):
+            raise ValueError("Missing required fields: 'event' and 'file' are required")
+        try:
+            priority = int(data.get("priority") or 0)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid priority '{data.get('priority')}'")
+        key = data.get("idempotency_key")
+        ts = data.get("timestamp")
+        return cls(
+            event=str(data["event"]),
+            file=str(data["file"]),
+            title=str(data["title"]) if data.get("title") else None,
+            lane=resolve_lane(data),
+            priority=priority,
+            idempotency_key=str(key) if key else None,
+            event_ts=str(ts) if ts is not None else None,
+        )
+
+
+# Requête préparée unique de création de job (réutilisée par le cache de statements).
+# Seul un doublon d'idempotency_key est ignoré : toute autre contrainte lève.
+_INSERT_JOB_SQL = """
+    INSERT INTO jobs(event, file, title, event_ts, status, lane, priority, idempotency_key,
+                     next_attempt_at, enqueued_at, created_at, updated_at)
+    VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(idempotency_key) WHERE idempotency_key IS NOT NULL DO NOTHING
+"""
+
 
+def insert_jobs(events: List[Any]) -> List[int]:
+    """Seul chemin de création de jobs : insère un lot d'événements
+    (JobEvent ou payloads dict) en une transaction (executemany).
 
-def get_job_by_file(path: str) -> Optional[sqlite3.Row]:
+    Retourne les IDs de job dans l'ordre des événements. Un événement dont
+    l'`idempotency_key` existe déjà retourne le job existant sans en créer
+    de nouveau ; les événements sans clé reçoivent une clé générée.
+    """
+    events = [e if isinstance(e, JobEvent) else JobEvent.from_payload(e) for e in events]
+    ts, t = now(), time.time()
+    keys = [e.idempotency_key or f"auto:{uuid.uuid4().hex}" for e in events]
+    stages = [entry_stage(e.file) for e in events]
+    rows = [
+        (e.event, e.file, e.title, e.event_ts, STAGES[stage]["input"], e.lane, e.priority, key,
+         t, t, ts, ts)
+        for e, stage, key in zip(events, stages, keys)
+    ]
     with db() as c:
-        row = c.execute(
-            "SELECT * FROM jobs WHERE file = ? ORDER BY id DESC LIMIT 1",
-            (path,)
-        ).fetchone()
-        return row
+        before = c.total_changes
+        c.executemany(_INSERT_JOB_SQL, rows)
+        created = c.total_changes - before
+        
+        ids: Dict[str, int] = {}
+        unique_keys = list(dict.fromkeys(keys))
+        for i in range(0, len(unique_keys), 500):
+            chunk = unique_keys[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            for r in c.execute(
+                f"SELECT id, idempotency_key FROM jobs WHERE idempotency_key IN ({marks})", chunk
+            ):
+                ids[r["idempotency_key"]] = r["id"]
+    if created:
+        for stage in set(stages):
+            wake_workers(stage, min(created, stages.count(stage)))
+    return [ids[key] for key in keys]
 
 
-def insert_job(path: str) -> int:
+def insert_job(path: str, lane: str = DEFAULT_LANE, priority: int = 0,
+               event: str = "internal", title: Optional[str] = None) -> int:
+    return insert_jobs([JobEvent(event=event, file=path, title=title, lane=lane, priority=priority)])[0]
+
+
+def requeue_job(job_id: int) -> Optional[int]:
+    """Recrée un job terminé (done / error, y compris archivé) : nouveau job
+    sur le même fichier, même lane et priorité. None si introuvable."""
     with db() as c:
-        ts = now()
-        c.execute(
-            "INSERT INTO jobs(file, status, created_at, updated_at) VALUES(?,?,?,?)",
-            (path, "queued", ts, ts)
-        )
-        return c.lastrowid
+        row = c.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    job = dict(row) if row else get_archived_job(job_id)
+    if not job:
+        return None
+    if job["status"] not in TERMINAL_STATUSES:
+        raise ValueError(f"Job #{job_id} is still {job['status']}")
+    return insert_jobs([JobEvent(
+        event="requeue", file=job["file"], title=job.get("title"),
+        lane=job.get("lane") or DEFAULT_LANE, priority=job.get("priority") or 0,
+        idempotency_key=f"requeue:{job_id}:{uuid.uuid4().hex}"
+    )])[0]
 
 
-def set_status(job_id: int, status: str, **kwargs):
+def _update_job(c: sqlite3.Connection, job_id: int, status: str,
+                fence: Optional[str] = None, **kwargs) -> bool:
+    """UPDATE du job. Avec `fence`, n'écrit que si le claim_token correspond
+    encore (le lease n'a pas été repris par un autre worker)."""
     fields = ["status = ?", "updated_at = ?"]
     values = [status, now()]
     
@@ -82,113 +563,1232 @@ def set_status(job_id: int, status: str, **kwargs):
         fields.append(f"{k} = ?")
         values.append(v)
     
+    where = "id = ?"
     values.append(job_id)
+    if fence is not None:
+        where += " AND claim_token = ?"
+        values.append(fence)
     
+    cur = c.execute(
+        f"UPDATE jobs SET {', '.join(fields)} WHERE {where}",
+        values
+    )
+    return cur.rowcount > 0
+
+
+def set_status(job_id: int, status: str, fence: Optional[str] = None, **kwargs) -> bool:
     with db() as c:
-        c.execute(
-            f"UPDATE jobs SET {', '.join(fields)} WHERE id = ?",
-            values
+        return _update_job(c, job_id, status, fence=fence, **kwargs)
+
+
+_CLAIM_SQL = """
+    UPDATE jobs
+       SET status = ?, claim_token = ?, claimed_at = ?, updated_at = ?,
+           heartbeat_at = ?, lease_expires_at = ?
+     WHERE id = (SELECT id FROM jobs WHERE {where} ORDER BY {order} LIMIT 1)
+       AND status = ?
+    RETURNING *
+"""
+# Dans une lane, pour une priorité donnée : FIFO des jobs échus. Le filtre
+# next_attempt_at est une borne de l'index idx_jobs_lane
+# (status, lane, priority DESC, next_attempt_at), pas un post-filtre.
+_CLAIM_LANE_SQL = _CLAIM_SQL.format(
+    where="status = ? AND lane = ? AND priority = ? AND next_attempt_at <= ?",
+    order="next_attempt_at ASC, id ASC"
+)
+# Priorité suivante (décroissante) présente dans la lane : une descente d'index
+_NEXT_PRIORITY_SQL = """
+    SELECT priority FROM jobs WHERE status = ? AND lane = ? AND priority < ?
+    ORDER BY priority DESC LIMIT 1
+"""
+# Filet de sécurité (lane absente de LANE_WEIGHTS) : FIFO (index idx_jobs_due)
+_CLAIM_ANY_SQL = _CLAIM_SQL.format(
+    where="status = ? AND next_attempt_at <= ?",
+    order="next_attempt_at ASC, id ASC"
+)
+
+
+def claim_in_lane(c: sqlite3.Connection, claim: tuple, status: str, lane: str, t: float) -> Optional[sqlite3.Row]:
+    """Claim dans une lane : priorité décroissante puis FIFO. On descend les
+    priorités présentes une à une (peu nombreuses), chaque essai étant une
+    recherche d'intervalle dans idx_jobs_lane."""
+    priority = float("inf")
+    while True:
+        row = c.execute(_NEXT_PRIORITY_SQL, (status, lane, priority)).fetchone()
+        if row is None:
+            return None
+        priority = row[0]
+        job = c.execute(_CLAIM_LANE_SQL, claim + (status, lane, priority, t, status)).fetchone()
+        if job:
+            return job
+
+
+def ready_lanes(c: sqlite3.Connection, status: str, t: float) -> List[str]:
+    """Lanes qui ont au moins un job éligible dans la file `status`"""
+    return [
+        lane for lane in LANE_WEIGHTS
+        if c.execute(
+            "SELECT 1 FROM jobs WHERE status = ? AND lane = ? AND next_attempt_at <= ? LIMIT 1",
+            (status, lane, t)
+        ).fetchone()
+    ]
+
+
+def pick_lane(stage: str, ready: List[str]) -> str:
+    """Smooth weighted round-robin : chaque lane prête reçoit son poids en
+    crédit, la plus créditée est servie puis débitée du total. Sur la durée,
+    chaque lane obtient une part proportionnelle à son poids."""
+    with _lane_lock:
+        credit = _lane_credit[stage]
+        total = 0
+        for lane in ready:
+            credit[lane] = credit.get(lane, 0) + LANE_WEIGHTS[lane]
+            total += LANE_WEIGHTS[lane]
+        best = max(ready, key=lambda lane: credit[lane])
+        credit[best] -= total
+        return best
+
+
+def claim_next(stage: str = "narrator") -> Optional[sqlite3.Row]:
+    """Réserve atomiquement le prochain job de la file d'une étape.
+
+    La lane est choisie par le scheduler pondéré parmi celles qui ont du
+    travail ; dans la lane, priority DESC puis FIFO. Le UPDATE conditionnel
+    s'exécute sous le verrou d'écriture SQLite : deux workers ne peuvent
+    jamais obtenir la même ligne. Le claim_token identifie le worker
+    propriétaire du job, qui détient un lease de JOB_LEASE_SEC. Seuls les
+    jobs dont next_attempt_at est passé sont éligibles.
+    """
+    cfg = STAGES[stage]
+    token = uuid.uuid4().hex
+    ts, t = now(), time.time()
+    claim = (cfg["running"], token, ts, ts, t, t + JOB_LEASE_SEC)
+    with db() as c:
+        ready = ready_lanes(c, cfg["input"], t)
+        if ready:
+            first = pick_lane(stage, ready)
+            # Lane choisie d'abord ; si un autre worker l'a vidée, les suivantes
+            for lane in [first] + [l for l in ready if l != first]:
+                row = claim_in_lane(c, claim, cfg["input"], lane, t)
+                if row:
+                    return row
+        return c.execute(_CLAIM_ANY_SQL, claim + (cfg["input"], t, cfg["input"])).fetchone()
+
+
+# --------------- Leases ---------------
+@contextmanager
+def hold_lease(job: sqlite3.Row):
+    """Maintient le lease du job (heartbeat) pendant l'exécution de l'étape"""
+    with _leases_lock:
+        _leases[job["id"]] = job["claim_token"]
+    try:
+        yield
+    finally:
+        with _leases_lock:
+            _leases.pop(job["id"], None)
+
+
+def renew_leases() -> int:
+    """Heartbeat : prolonge les leases des jobs en cours dans ce process"""
+    with _leases_lock:
+        held = list(_leases.items())
+    if not held:
+        return 0
+    t = time.time()
+    with db() as c:
+        c.executemany(
+            "UPDATE jobs SET heartbeat_at = ?, lease_expires_at = ? WHERE id = ? AND claim_token = ?",
+            [(t, t + JOB_LEASE_SEC, job_id, token) for job_id, token in held]
         )
+    return len(held)
 
 
-def next_queued() -> Optional[sqlite3.Row]:
+def reap_expired_leases() -> int:
+    """Remet en file les jobs dont le lease a expiré (worker ou process mort)"""
+    t, ts = time.time(), now()
+    reaped = 0
     with db() as c:
-        row = c.execute(
-            "SELECT * FROM jobs WHERE status = 'queued' ORDER BY id ASC LIMIT 1"
-        ).fetchone()
-        return row
+        for stage, cfg in STAGES.items():
+            rows = c.execute(
+                """
+                UPDATE jobs
+                   SET status = CASE WHEN attempts + 1 >= ? THEN 'error' ELSE ? END,
+                       attempts = attempts + 1, claim_token = NULL, lease_expires_at = NULL,
+                       next_attempt_at = ?, last_error = ?, updated_at = ?
+                 WHERE status = ? AND COALESCE(lease_expires_at, 0) < ?
+                RETURNING id, status
+                """,
+                (JOB_MAX_ATTEMPTS, cfg["input"], t, f"{stage}: lease expired", ts, cfg["running"], t)
+            ).fetchall()
+            for r in rows:
+                print(f"[Reaper] job #{r['id']} lease expired in {stage} → {r['status']}")
+            requeued = sum(1 for r in rows if r["status"] == cfg["input"])
+            if requeued:
+                wake_workers(stage, requeued)
+            reaped += len(rows)
+    return reaped
+
+
+def prune_job_events() -> int:
+    """Garde les JOB_EVENTS_RETENTION derniers job_events"""
+    with db() as c:
+        cur = c.execute(
+            "DELETE FROM job_events WHERE id <= (SELECT MAX(id) FROM job_events) - ?",
+            (JOB_EVENTS_RETENTION,)
+        )
+        return cur.rowcount
+
+
+def archive_jobs(older_than_days: float = ARCHIVE_AFTER_DAYS, batch: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Déplace les jobs terminés depuis plus de `older_than_days` jours vers
+    jobs_archive, par lots (une transaction par lot : DELETE ... RETURNING
+    puis INSERT, le job n'existe jamais dans les deux tables ni dans aucune)."""
+    cutoff = (datetime.utcnow() - timedelta(days=older_than_days)).isoformat(timespec="milliseconds")
+    marks = ",".join("?" * len(TERMINAL_STATUSES))
+    archived = 0
+    while True:
+        ts = now()
+        with db() as c:
+            rows = c.execute(
+                f"""
+                DELETE FROM jobs
+                 WHERE id IN (SELECT id FROM jobs
+                               WHERE status IN ({marks}) AND updated_at < ? LIMIT ?)
+                RETURNING *
+                """,
+                (*TERMINAL_STATUSES, cutoff, batch)
+            ).fetchall()
+            c.executemany(
+                """
+                INSERT OR REPLACE INTO jobs_archive(id, file, status, lane, post_id, link,
+                                                    created_at, updated_at, archived_at, data)
+                VALUES(?,?,?,?,?,?,?,?,?,?)
+                """,
+                [
+                    (r["id"], r["file"], r["status"], r["lane"], r["post_id"], r["link"],
+                     r["created_at"], r["updated_at"], ts,
+                     zlib.compress(json.dumps(dict(r), ensure_ascii=False).encode("utf-8")))
+                    for r in rows
+                ]
+            )
+        archived += len(rows)
+        if len(rows) < batch:
+            break
+    if archived:
+        print(f"[Archive] {archived} job(s) moved to jobs_archive")
+    return archived
+
+
+def get_archived_job(job_id: int) -> Optional[Dict[str, Any]]:
+    with db() as c:
+        row = c.execute("SELECT data, archived_at FROM jobs_archive WHERE id = ?", (job_id,)).fetchone()
+    if not row:
+        return None
+    job = json.loads(zlib.decompress(row["data"]))
+    job["archived_at"] = row["archived_at"]
+    return job
+
+
+def maintenance_loop():
+    """Heartbeat des leases détenus, reaper des leases expirés, purge des
+    job_events et archivage périodique des jobs terminés"""
+    last_archive = 0.0
+    while not _shutdown.wait(HEARTBEAT_INTERVAL):
+        try:
+            renew_leases()
+            reap_expired_leases()
+            prune_job_events()
+            if ARCHIVE_AFTER_DAYS and time.monotonic() - last_archive >= ARCHIVE_INTERVAL_SEC:
+                last_archive = time.monotonic()
+                archive_jobs()
+        except Exception as e:
+            print(f"[Maintenance] ⚠️ error: {str(e)[:800]}")
+
+
+# --------------- Queue signaling ---------------
+def wake_workers(stage: str = "narrator", count: int = 1):
+    """Réveille les workers d'une étape après l'ajout de `count` jobs"""
+    cv = _stage_cv[stage]
+    with cv:
+        _stage_seq[stage] += 1
+        cv.notify(count)
+
+
+def wait_for_work(stage: str, seen: int, timeout: float) -> int:
+    """Attend un nouveau job dans la file `stage` depuis la séquence `seen`.
+
+    Si un job a été ajouté entre le snapshot `seen` et l'appel, on
+    retourne immédiatement : aucun réveil n'est perdu.
+    """
+    cv = _stage_cv[stage]
+    with cv:
+        if _stage_seq[stage] == seen and not _shutdown.is_set():
+            cv.wait(timeout)
+        return _stage_seq[stage]
+
+
+# --------------- Admission control ---------------
+class TokenBucket:
+    """Token bucket : `rate` jetons/s, au plus `burst` en réserve"""
+    
+    def __init__(self, rate: float, burst: float):
+        self.rate, self.burst = rate, burst
+        self.tokens = burst
+        self.stamp = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def take(self, n: float = 1) -> float:
+        """Consomme n jetons ; sinon retourne l'attente (s) avant qu'ils soient dispo"""
+        with self._lock:
+            t = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (t - self.stamp) * self.rate)
+            self.stamp = t
+            if self.tokens >= n:
+                self.tokens -= n
+                return 0.0
+            return (n - self.tokens) / self.rate if self.rate else float("inf")
+    
+    def give(self, n: float = 1):
+        """Rend n jetons (requête refusée après coup)"""
+        with self._lock:
+            self.tokens = min(self.burst, self.tokens + n)
+
+
+def record_drained(lane: str):
+    """Un job a quitté la file (done ou error) : alimente le débit de vidage"""
+    t = time.time()
+    with _admission_lock:
+        _drained.append((t, lane))
+        while _drained and _drained[0][0] < t - DRAIN_WINDOW_SEC:
+            _drained.popleft()
+
+
+def drain_rate(lane: Optional[str] = None) -> float:
+    """Jobs sortis de file par seconde sur DRAIN_WINDOW_SEC (toutes lanes ou une lane)"""
+    cutoff = time.time() - DRAIN_WINDOW_SEC
+    with _admission_lock:
+        n = sum(1 for t, l in _drained if t >= cutoff and (lane is None or l == lane))
+    return n / DRAIN_WINDOW_SEC
+
+
+def retry_after(excess: int, rate: float) -> int:
+    """Secondes avant que `excess` jobs soient sortis de file au débit observé"""
+    if rate <= 0:
+        return RETRY_AFTER_MAX_SEC
+    return max(1, min(RETRY_AFTER_MAX_SEC, math.ceil(excess / rate)))
+
+
+def queue_depths() -> Dict[str, int]:
+    """Jobs en file ou en cours, par lane"""
+    marks = ",".join("?" * len(ACTIVE_STATUSES))
+    with db() as c:
+        rows = c.execute(
+            f"SELECT lane, COUNT(*) AS n FROM jobs WHERE status IN ({marks}) GROUP BY lane",
+            ACTIVE_STATUSES
+        ).fetchall()
+    return {r["lane"]: r["n"] for r in rows}
+
+
+def _reject(reason: str, error: str, wait: Optional[int] = None) -> JSONResponse:
+    """Refus d'admission : 429 + Retry-After, ou 413 sans `wait` (jamais admissible)"""
+    with _admission_lock:
+        _admission_stats[reason] += 1
+    if wait is None:
+        print(f"[Admission] 413 {reason}: {error}")
+        return JSONResponse(status_code=413, content={"ok": False, "error": error})
+    print(f"[Admission] 429 {reason}: {error} (retry in {wait}s)")
+    return JSONResponse(
+        status_code=429,
+        content={"ok": False, "error": error, "retry_after": wait},
+        headers={"Retry-After": str(wait)}
+    )
+
+
+def admit(source: str, lanes: List[str]) -> Optional[JSONResponse]:
+    """Admission d'une requête de `source` qui enfile un job par lane de `lanes`.
+
+    Retourne None si acceptée, sinon la réponse 413/429 à renvoyer.
+    """
+    bucket, cost = None, max(1, len(lanes))
+    if SOURCE_RATE_PER_SEC:
+        # Un jeton par job enfilé : un batch coûte autant que ses événements
+        if cost > SOURCE_BURST:
+            # Jamais satisfaisable (la réserve plafonne à SOURCE_BURST) : à découper
+            return _reject(
+                "too_large",
+                f"Batch of {cost} events exceeds the per-source burst ({SOURCE_BURST:g}); "
+                f"split it into batches of at most {int(SOURCE_BURST)}"
+            )
+        with _admission_lock:
+            bucket = _sources.get(source)
+            if bucket is None:
+                if len(_sources) >= 10000:
+                    _sources.clear()
+                bucket = _sources[source] = TokenBucket(SOURCE_RATE_PER_SEC, SOURCE_BURST)
+        wait = bucket.take(cost)
+        if wait:
+            return _reject(
+                "rate_limited", f"Rate limit exceeded for source '{source}'",
+                max(1, min(RETRY_AFTER_MAX_SEC, math.ceil(wait)))
+            )
+    
+    def queue_full(error: str, wait: int) -> JSONResponse:
+        # Rien n'est enfilé : la source récupère ses jetons
+        if bucket is not None:
+            bucket.give(cost)
+        return _reject("queue_full", error, wait)
+    
+    if MAX_QUEUE_DEPTH or LANE_MAX_DEPTH:
+        depths = queue_depths()
+        excess = sum(depths.values()) + len(lanes) - MAX_QUEUE_DEPTH
+        if MAX_QUEUE_DEPTH and excess > 0:
+            return queue_full(
+                f"Queue full ({sum(depths.values())}/{MAX_QUEUE_DEPTH} jobs)",
+                retry_after(excess, drain_rate())
+            )
+        for lane in set(lanes):
+            limit = LANE_MAX_DEPTH.get(lane)
+            excess = depths.get(lane, 0) + lanes.count(lane) - (limit or 0)
+            if limit and excess > 0:
+                return queue_full(
+                    f"Lane '{lane}' full ({depths.get(lane, 0)}/{limit} jobs)",
+                    retry_after(excess, drain_rate(lane))
+                )
+    
+    with _admission_lock:
+        _admission_stats["accepted"] += 1
+    return None
+
+
+def event_source(request: Request, data: Any = None) -> str:
+    """Appelant d'un /event : header X-Source, champ `source`, sinon IP"""
+    source = request.headers.get("X-Source")
+    if not source and isinstance(data, dict):
+        source = data.get("source")
+    if not source and request.client:
+        source = request.client.host
+    return str(source or "unknown")
+
+
+# --------------- Metrics ---------------
+# Buckets (secondes) communs aux latences : de 5 ms à 30 min
+LATENCY_BUCKETS = (0.005, 0.025, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+ATTEMPT_BUCKETS = (0, 1, 2, 3, 5, 8, 13)
+
+
+class Histogram:
+    """Histogramme Prometheus minimal (cumulatif, par jeu de labels)"""
+    
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help_text, labels, buckets
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float, *label_values: str):
+        with self._lock:
+            series = self._series.setdefault(label_values, [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, (counts, total, count) in sorted(self._series.items()):
+                base = ",".join(f'{k}="{v}"' for k, v in zip(self.labels, label_values))
+                sep = "," if base else ""
+                for bound, n in zip(self.buckets, counts):
+                    lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound}"}} {n}')
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {count}')
+                labels = f"{{{base}}}" if base else ""
+                lines.append(f"{self.name}_sum{labels} {total:.6f}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+QUEUE_WAIT = Histogram(
+    "gateway_queue_wait_seconds", "Time a job waited in a stage queue once eligible", ("stage",)
+)
+STAGE_DURATION = Histogram(
+    "gateway_stage_duration_seconds", "Duration of a stage call", ("stage", "outcome")
+)
+STAGE_RETRIES = Histogram(
+    "gateway_stage_retries", "Failed attempts before a stage succeeded", ("stage",), ATTEMPT_BUCKETS
+)
+END_TO_END = Histogram(
+    "gateway_job_end_to_end_seconds", "Time from enqueue to done"
+)
+LIMITER_WAIT = Histogram(
+    "gateway_downstream_limiter_wait_seconds",
+    "Time a call waited for a downstream concurrency slot and rate token", ("downstream",)
+)
+HISTOGRAMS = [QUEUE_WAIT, STAGE_DURATION, STAGE_RETRIES, END_TO_END, LIMITER_WAIT]
+
+
+def _gauge(name: str, help_text: str, samples: List[tuple], kind: str = "gauge") -> List[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        label_str = ",".join(f'{k}="{v}"' for k, v in labels.items())
+        lines.append(f"{name}{{{label_str}}} {value}" if label_str else f"{name} {value}")
+    return lines
+
+
+def render_metrics() -> str:
+    """Exposition Prometheus : histogrammes en mémoire + états lus en base"""
+    lines: List[str] = []
+    for h in HISTOGRAMS:
+        lines.extend(h.render())
+    
+    with db() as c:
+        jobs_by_status = c.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        outbox_by_status = c.execute("SELECT status, COUNT(*) AS n FROM outbox GROUP BY status").fetchall()
+    lines.extend(_gauge(
+        "gateway_jobs", "Jobs by status",
+        [({"status": r["status"]}, r["n"]) for r in jobs_by_status]
+    ))
+    lines.extend(_gauge(
+        "gateway_outbox_messages", "Outbox messages by status",
+        [({"status": r["status"]}, r["n"]) for r in outbox_by_status]
+    ))
+    
+    lines.extend(_gauge(
+        "gateway_queue_depth", "Queued or in-flight jobs by lane",
+        [({"lane": lane}, n) for lane, n in sorted(queue_depths().items())]
+    ))
+    lines.extend(_gauge(
+        "gateway_downstream_in_flight", "Calls currently in flight per downstream",
+        [({"downstream": name}, lim.in_flight) for name, lim in sorted(LIMITERS.items())]
+    ))
+    with _admission_lock:
+        admission = dict(_admission_stats)
+    lines.extend(_gauge(
+        "gateway_admission_requests_total", "Ingest requests by admission result",
+        [({"result": k}, v) for k, v in sorted(admission.items())], "counter"
+    ))
+    
+    with _cache_lock:
+        stats = dict(_cache_stats)
+    lines.extend(_gauge(
+        "gateway_narrator_cache_lookups_total", "Narrator cache lookups by result",
+        [({"result": k}, v) for k, v in sorted(stats.items())], "counter"
+    ))
+    return "\n".join(lines) + "\n"
+
+
+# --------------- Job events stream ---------------
+def publish_job_events():
+    """Réveille les flux SSE (appelé après commit, depuis n'importe quel thread)"""
+    with _stream_lock:
+        subscribers = list(_stream_subscribers)
+    for loop, event in subscribers:
+        try:
+            loop.call_soon_threadsafe(event.set)
+        except RuntimeError:
+            pass  # boucle fermée : l'abonné se retire de lui-même
+
+
+def fetch_job_events(after_id: int, limit: int = 500) -> List[Dict[str, Any]]:
+    with db() as c:
+        rows = c.execute(
+            "SELECT * FROM job_events WHERE id > ? ORDER BY id ASC LIMIT ?",
+            (after_id, limit)
+        ).fetchall()
+    return [dict(r) for r in rows]
+
+
+def last_job_event_id() -> int:
+    with db() as c:
+        return c.execute("SELECT COALESCE(MAX(id), 0) FROM job_events").fetchone()[0]
+
+
+async def job_event_stream(last_event_id: Optional[int] = None, request: Optional[Request] = None):
+    """Générateur SSE : rejoue les événements après last_event_id puis suit en direct.
+
+    Chaque commit réveille tous les abonnés : les lectures SQLite passent par
+    le threadpool pour ne pas bloquer la boucle d'événements.
+    """
+    last = await run_in_threadpool(last_job_event_id) if last_event_id is None else last_event_id
+    wakeup = asyncio.Event()
+    subscriber = (asyncio.get_running_loop(), wakeup)
+    with _stream_lock:
+        _stream_subscribers.add(subscriber)
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            if request is not None and await request.is_disconnected():
+                break
+            wakeup.clear()
+            events = await run_in_threadpool(fetch_job_events, last)
+            for e in events:
+                last = e["id"]
+                yield f"id: {last}\nevent: job\ndata: {json.dumps(e, ensure_ascii=False)}\n\n"
+            if events:
+                continue
+            try:
+                await asyncio.wait_for(wakeup.wait(), STREAM_KEEPALIVE_SEC)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+    finally:
+        with _stream_lock:
+            _stream_subscribers.discard(subscriber)
+
+
+# --------------- Downstream limits ---------------
+class DownstreamLimiter:
+    """Plafond de requêtes simultanées + token bucket pour un service en aval.
+
+    Partagé par tous les workers : même avec 8 workers narrator, Ollama ne
+    voit jamais plus de `max_in_flight` requêtes ni plus de `rps` requêtes/s.
+    """
+    
+    def __init__(self, name: str, rps: float, max_in_flight: int):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._bucket = TokenBucket(rps, max(1.0, rps)) if rps else None
+        self._lock = threading.Lock()
+    
+    @contextmanager
+    def acquire(self):
+        started = time.monotonic()
+        self._slots.acquire()
+        try:
+            while self._bucket is not None:
+                wait = self._bucket.take()
+                if not wait:
+                    break
+                time.sleep(wait)
+            LIMITER_WAIT.observe(time.monotonic() - started, self.name)
+            with self._lock:
+                self.in_flight += 1
+            try:
+                yield
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
+        finally:
+            self._slots.release()
+
+
+LIMITERS = {
+    "narrator": DownstreamLimiter("narrator", NARRATOR_RPS, NARRATOR_MAX_IN_FLIGHT),
+    "builder": DownstreamLimiter("builder", BUILDER_RPS, BUILDER_MAX_IN_FLIGHT),
+    "publisher": DownstreamLimiter("publisher", PUBLISHER_RPS, PUBLISHER_MAX_IN_FLIGHT),
+}
 
 
 # --------------- HTTP helpers ---------------
-@retry(wait=wait_fixed(2), stop=stop_after_attempt(3))
+# Une session par service en aval : connexions keep-alive réutilisées (pas de
+# handshake TCP/TLS par appel), pool dimensionné sur les appels simultanés
+# autorisés par le limiteur.
+def _session(pool_size: int) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+SESSIONS = {name: _session(lim.max_in_flight) for name, lim in LIMITERS.items()}
+SESSIONS["downloader"] = _session(DOWNLOADER_CONCURRENCY * DOWNLOAD_PARTS)
+
+
+def close_sessions():
+    for session in SESSIONS.values():
+        session.close()
+
+
 def call_narrator(file_path: str) -> Dict[str, Any]:
-    r = requests.post(NARRATOR_URL, json={"file": file_path}, timeout=60)
+    with LIMITERS["narrator"].acquire():
+        r = SESSIONS["narrator"].post(
+            NARRATOR_URL, json={"file": file_path},
+            timeout=(NARRATOR_CONNECT_TIMEOUT_SEC, NARRATOR_READ_TIMEOUT_SEC)
+        )
     r.raise_for_status()
     return r.json()
 
 
-@retry(wait=wait_fixed(2), stop=stop_after_attempt(3))
 def call_builder(meta: Dict[str, Any]) -> Dict[str, Any]:
-    r = requests.post(BUILDER_URL, json=meta, timeout=120)
+    with LIMITERS["builder"].acquire():
+        r = SESSIONS["builder"].post(
+            BUILDER_URL, json=meta,
+            timeout=(BUILDER_CONNECT_TIMEOUT_SEC, BUILDER_READ_TIMEOUT_SEC)
+        )
     if r.status_code not in (200, 201):
         raise RuntimeError(f"Builder error {r.status_code}: {r.text[:400]}")
     return r.json()
 
 
-def notify_publisher(title: str, link: str):
-    """Notifie le Publisher AI (emails + réseaux)"""
+# Types de messages outbox → (URL, timeout (connexion, lecture))
+OUTBOX_TARGETS = {
+    "notify": (PUBLISHER_URL, (PUBLISHER_CONNECT_TIMEOUT_SEC, PUBLISHER_READ_TIMEOUT_SEC)),
+    "social": (PUBLISHER_SOCIAL_URL, (PUBLISHER_CONNECT_TIMEOUT_SEC, PUBLISHER_SOCIAL_READ_TIMEOUT_SEC)),
+}
+
+
+def deliver_message(kind: str, payload: Dict[str, Any]):
+    """Livre un message outbox au Publisher AI (lève une exception si échec)"""
+    url, timeout = OUTBOX_TARGETS[kind]
+    with LIMITERS["publisher"].acquire():
+        r = SESSIONS["publisher"].post(url, json=payload, timeout=timeout)
+    r.raise_for_status()
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Backoff exponentiel avec jitter ("full jitter") pour la tentative n°attempt"""
+    return random.uniform(0, min(cap, base * (2 ** max(0, attempt - 1))))
+
+
+# --------------- Outbox ---------------
+def enqueue_notifications(c: sqlite3.Connection, job: sqlite3.Row, link: Optional[str]):
+    """Écrit les notifications du job dans l'outbox (transaction de l'appelant)"""
+    meta = json.loads(job["narrator_json"] or "{}")
+    title = meta.get("title", "New content")
+    messages = [
+        ("notify", {"title": title, "link": link or ""}),
+        ("social", {"title": title, "link": link or "", "description": ""}),
+    ]
+    ts, due = now(), time.time()
+    c.executemany(
+        "INSERT INTO outbox(job_id, kind, payload, next_attempt_at, created_at) VALUES(?,?,?,?,?)",
+        [(job["id"], kind, json.dumps(p, ensure_ascii=False), due, ts) for kind, p in messages]
+    )
+
+
+def claim_outbox_batch(limit: int = OUTBOX_BATCH_SIZE) -> list:
+    """Réserve un lot de messages dus (status 'pending' → 'sending')"""
+    with db() as c:
+        return c.execute(
+            """
+            UPDATE outbox SET status = 'sending', attempts = attempts + 1
+             WHERE id IN (SELECT id FROM outbox
+                           WHERE status = 'pending' AND next_attempt_at <= ?
+                           ORDER BY next_attempt_at ASC LIMIT ?)
+            RETURNING *
+            """,
+            (time.time(), limit)
+        ).fetchall()
+
+
+def _deliver(row: sqlite3.Row) -> Optional[str]:
     try:
-        # Notification simple
-        requests.post(
-            PUBLISHER_URL,
-            json={"title": title, "link": link},
-            timeout=10
+        deliver_message(row["kind"], json.loads(row["payload"]))
+        return None
+    except Exception as e:
+        return str(e)[:800] or e.__class__.__name__
+
+
+def deliver_outbox_batch(rows: list, pool: ThreadPoolExecutor):
+    """Livre un lot en parallèle puis enregistre tous les résultats en une transaction"""
+    errors = list(pool.map(_deliver, rows))
+    sent, retry, dead = [], [], []
+    ts = now()
+    for row, err in zip(rows, errors):
+        if err is None:
+            sent.append((ts, row["id"]))
+        elif row["attempts"] >= OUTBOX_MAX_ATTEMPTS:
+            dead.append((err, row["id"]))
+            print(f"[Outbox] ❌ message #{row['id']} ({row['kind']}) abandonné: {err}")
+        else:
+            delay = backoff_delay(row["attempts"], OUTBOX_RETRY_BASE_SEC, OUTBOX_RETRY_MAX_SEC)
+            retry.append((time.time() + delay, err, row["id"]))
+    
+    with db() as c:
+        c.executemany(
+            "UPDATE outbox SET status = 'sent', sent_at = ?, last_error = NULL WHERE id = ?", sent
         )
-        
-        # Publication sociale (optionnel)
-        requests.post(
-            f"{PUBLISHER_URL.replace('/notify', '/social/publish')}",
-            json={
-                "title": title,
-                "link": link,
-                "description": ""
-            },
-            timeout=300
+        c.executemany(
+            "UPDATE outbox SET status = 'pending', next_attempt_at = ?, last_error = ? WHERE id = ?",
+            retry
         )
-    except Exception as e:
-        print(f"[Gateway] ⚠️ Publisher skip: {e}")
+        c.executemany("UPDATE outbox SET status = 'dead', last_error = ? WHERE id = ?", dead)
+
+
+def outbox_loop(concurrency: int = PUBLISHER_CONCURRENCY):
+    print(f"[Outbox] delivery loop started ({concurrency} in flight)")
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="gateway-outbox") as pool:
+        while not _shutdown.is_set():
+            _outbox_wakeup.clear()
+            try:
+                rows = claim_outbox_batch()
+                if rows:
+                    deliver_outbox_batch(rows, pool)
+                    continue
+            except Exception as e:
+                print(f"[Outbox] ⚠️ error: {str(e)[:800]}")
+            # Rien de dû : on attend un nouveau 'done' ou le prochain retry
+            _outbox_wakeup.wait(WORKER_INTERVAL)
+
+
+# --------------- Narrator cache ---------------
+def _hash_range(f, h, start: int, length: int, chunk: int = 64 * 1024):
+    f.seek(start)
+    while length > 0:
+        data = f.read(min(chunk, length))
+        if not data:
+            break
+        h.update(data)
+        length -= len(data)
+
+
+def fingerprint(path: str) -> Optional[str]:
+    """Empreinte de contenu d'un fichier local (None si pas de fichier local).
+
+    Taille + hash streamé du début, du milieu et de la fin du fichier : un
+    re-upload du même contenu retrouve la même empreinte. Le résultat est
+    mémorisé par (path, size, mtime) pour ne pas relire un fichier inchangé.
+    """
+    try:
+        st = os.stat(path)
+    except (OSError, ValueError, TypeError):
+        return None
+    if not os.path.isfile(path):
+        return None
+    
+    memo_key = (path, st.st_size, st.st_mtime_ns)
+    with _cache_lock:
+        if memo_key in _fingerprints:
+            return _fingerprints[memo_key]
+    
+    sample = FINGERPRINT_SAMPLE_BYTES
+    h = hashlib.sha256(f"{st.st_size}:".encode())
+    with open(path, "rb") as f:
+        if st.st_size <= 3 * sample:
+            _hash_range(f, h, 0, st.st_size)
+        else:
+            for start in (0, (st.st_size - sample) // 2, st.st_size - sample):
+                _hash_range(f, h, start, sample)
+    fp = h.hexdigest()
+    
+    with _cache_lock:
+        if len(_fingerprints) >= 4096:
+            _fingerprints.clear()
+        _fingerprints[memo_key] = fp
+    return fp
+
+
+def _count(stat: str):
+    with _cache_lock:
+        _cache_stats[stat] += 1
+
+
+def cache_lookup(fp: str) -> Optional[str]:
+    with db() as c:
+        row = c.execute(
+            "UPDATE narrator_cache SET hits = hits + 1, last_hit_at = ? WHERE fingerprint = ? "
+            "RETURNING narrator_json",
+            (now(), fp)
+        ).fetchone()
+    return row["narrator_json"] if row else None
+
+
+def cache_store(fp: str, narrator_json: str):
+    with db() as c:
+        c.execute(
+            "INSERT OR REPLACE INTO narrator_cache(fingerprint, narrator_json, created_at) VALUES(?,?,?)",
+            (fp, narrator_json, now())
+        )
+
+
+def cache_stats() -> Dict[str, Any]:
+    with _cache_lock:
+        stats = dict(_cache_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+    with db() as c:
+        stats["entries"] = c.execute("SELECT COUNT(*) FROM narrator_cache").fetchone()[0]
+    return stats
+
+
+# --------------- Download ---------------
+class ChunkedChecksum:
+    """sha256 des sha256 de chaque bloc de DOWNLOAD_CHUNK_BYTES.
+
+    Calculé au fil de l'eau, le résultat est le même que les blocs arrivent
+    dans l'ordre (flux unique) ou en parallèle (requêtes Range).
+    """
+    
+    def __init__(self, chunk_size: int):
+        self.chunk_size = chunk_size
+        self.digests: Dict[int, bytes] = {}
+        self._index, self._filled, self._h = 0, 0, hashlib.sha256()
+    
+    def update(self, data: bytes):
+        """Flux séquentiel : découpe aux frontières de blocs"""
+        while data:
+            take = min(len(data), self.chunk_size - self._filled)
+            self._h.update(data[:take])
+            self._filled += take
+            data = data[take:]
+            if self._filled == self.chunk_size:
+                self._close_block()
+    
+    def _close_block(self):
+        self.digests[self._index] = self._h.digest()
+        self._index, self._filled, self._h = self._index + 1, 0, hashlib.sha256()
+    
+    def hexdigest(self) -> str:
+        if self._filled or not self.digests:
+            self._close_block()
+        return hashlib.sha256(b"".join(self.digests[i] for i in sorted(self.digests))).hexdigest()
+
+
+def scratch_path(url: str) -> str:
+    ext = os.path.splitext(urlparse(url).path)[1].lower()
+    ext = ext if 1 < len(ext) <= 8 and ext[1:].isalnum() else ""
+    return os.path.join(DOWNLOAD_DIR, hashlib.sha256(url.encode("utf-8")).hexdigest()[:32] + ext)
+
+
+def _download_timeout():
+    return (DOWNLOAD_CONNECT_TIMEOUT_SEC, DOWNLOAD_READ_TIMEOUT_SEC)
+
+
+def _probe(url: str):
+    """(url finale, taille, Range accepté) ; (url, None, False) si HEAD échoue"""
+    try:
+        r = SESSIONS["downloader"].head(url, allow_redirects=True, timeout=_download_timeout())
+        if r.status_code >= 400:
+            return url, None, False
+        size = int(r.headers.get("Content-Length") or 0) or None
+        ranges = r.headers.get("Accept-Ranges", "").lower() == "bytes"
+        return r.url or url, size, ranges and size is not None
+    except (requests.RequestException, ValueError):
+        return url, None, False
+
+
+def _fetch_range(url: str, path: str, index: int, start: int, end: int) -> bytes:
+    """Télécharge [start, end] dans le fichier pré-alloué ; retourne le sha256 du bloc"""
+    h = hashlib.sha256()
+    written = 0
+    with SESSIONS["downloader"].get(
+        url, headers={"Range": f"bytes={start}-{end}"}, stream=True, timeout=_download_timeout()
+    ) as r:
+        if r.status_code != 206:
+            raise RuntimeError(f"Range request not honored ({r.status_code})")
+        with open(path, "r+b") as f:
+            f.seek(start)
+            for data in r.iter_content(256 * 1024):
+                h.update(data)
+                f.write(data)
+                written += len(data)
+    if written != end - start + 1:
+        raise RuntimeError(f"Short range read: {written}/{end - start + 1} bytes (block {index})")
+    return h.digest()
+
+
+def _download_ranged(url: str, path: str, size: int) -> str:
+    checksum = ChunkedChecksum(DOWNLOAD_CHUNK_BYTES)
+    with open(path, "wb") as f:
+        f.truncate(size)
+    blocks = [
+        (i, start, min(size, start + DOWNLOAD_CHUNK_BYTES) - 1)
+        for i, start in enumerate(range(0, size, DOWNLOAD_CHUNK_BYTES))
+    ]
+    with ThreadPoolExecutor(max_workers=min(DOWNLOAD_PARTS, len(blocks)),
+                            thread_name_prefix="gateway-download") as pool:
+        futures = {i: pool.submit(_fetch_range, url, path, i, start, end) for i, start, end in blocks}
+        for i, future in futures.items():
+            checksum.digests[i] = future.result()
+    return checksum.hexdigest()
+
+
+def _download_stream(url: str, path: str) -> str:
+    checksum = ChunkedChecksum(DOWNLOAD_CHUNK_BYTES)
+    with SESSIONS["downloader"].get(url, stream=True, timeout=_download_timeout()) as r:
+        r.raise_for_status()
+        with open(path, "wb") as f:
+            for data in r.iter_content(256 * 1024):
+                checksum.update(data)
+                f.write(data)
+    return checksum.hexdigest()
+
+
+def download(url: str) -> Dict[str, Any]:
+    """Copie une URL dans le scratch (Range parallèles si possible) et
+    retourne {local_path, checksum, source_size}. Un fichier déjà présent de
+    même taille est réutilisé."""
+    os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+    path = scratch_path(url)
+    final_url, size, ranged = _probe(url)
+    
+    if size is not None and os.path.isfile(path) and os.path.getsize(path) == size:
+        os.utime(path)  # LRU : fichier réutilisé
+        with open(path, "rb") as f:
+            checksum = ChunkedChecksum(DOWNLOAD_CHUNK_BYTES)
+            for data in iter(lambda: f.read(DOWNLOAD_CHUNK_BYTES), b""):
+                checksum.update(data)
+        return {"local_path": path, "checksum": checksum.hexdigest(), "source_size": size}
+    
+    part = f"{path}.{uuid.uuid4().hex[:8]}.part"
+    try:
+        if ranged and size > DOWNLOAD_CHUNK_BYTES and DOWNLOAD_PARTS > 1:
+            try:
+                checksum = _download_ranged(final_url, part, size)
+            except RuntimeError as e:
+                # Range refusé en cours de route : flux unique
+                print(f"[Download] ranged fetch failed ({e}), streaming {url}")
+                checksum = _download_stream(final_url, part)
+        else:
+            checksum = _download_stream(final_url, part)
+        os.replace(part, path)
+    finally:
+        if os.path.exists(part):
+            os.remove(part)
+    
+    # Le fichier n'est rattaché au job (local_path) qu'après cette étape
+    prune_scratch(keep=(path,))
+    return {"local_path": path, "checksum": checksum, "source_size": os.path.getsize(path)}
+
+
+def prune_scratch(max_bytes: Optional[int] = None, keep: Iterable[str] = ()) -> int:
+    """LRU : supprime les fichiers du scratch les moins récemment utilisés
+    (mtime) tant que le total dépasse max_bytes. Les fichiers des jobs encore
+    en cours, ceux de `keep` et les téléchargements partiels sont conservés."""
+    max_bytes = SCRATCH_MAX_BYTES if max_bytes is None else max_bytes
+    if not max_bytes or not os.path.isdir(DOWNLOAD_DIR):
+        return 0
+    marks = ",".join("?" * len(ACTIVE_STATUSES))
+    with db() as c:
+        in_use = {
+            r[0] for r in c.execute(
+                f"SELECT local_path FROM jobs WHERE local_path IS NOT NULL AND status IN ({marks})",
+                ACTIVE_STATUSES
+            )
+        }
+    in_use.update(keep)
+    entries = []
+    for entry in os.scandir(DOWNLOAD_DIR):
+        if entry.is_file() and not entry.name.endswith(".part"):
+            st = entry.stat()
+            entries.append((st.st_mtime, st.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path in in_use:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    if removed:
+        print(f"[Download] scratch LRU: {removed} file(s) removed")
+    return removed
+
+
+# --------------- Stages ---------------
+def run_downloader(job: sqlite3.Row) -> Dict[str, Any]:
+    return download(job["file"])
+
+
+def run_narrator(job: sqlite3.Row) -> Dict[str, Any]:
+    # Entrée distante : copie locale produite par l'étape downloader
+    path = job["local_path"] or job["file"]
+    if job["local_path"] and os.path.exists(path):
+        os.utime(path)  # LRU du scratch
+    fp = fingerprint(path) if NARRATOR_CACHE_ENABLED else None
+    if fp is None:
+        _count("bypassed")
+    else:
+        cached = cache_lookup(fp)
+        if cached is not None:
+            _count("hits")
+            print(f"[Cache] job #{job['id']} narrator hit {fp[:12]}")
+            # Le Narrator renseigne `file` : il doit désigner ce job, pas l'upload d'origine
+            meta = json.loads(cached)
+            meta["file"] = path
+            return {"narrator_json": json.dumps(meta, ensure_ascii=False), "fingerprint": fp}
+        _count("misses")
+    
+    meta = call_narrator(path)
+    if meta.get("error"):
+        # Le Narrator répond 200 avec {"error": ...} (ex. fichier introuvable)
+        raise RuntimeError(f"Narrator error: {meta['error']}")
+    narrator_json = json.dumps(meta, ensure_ascii=False)
+    if fp is not None:
+        cache_store(fp, narrator_json)
+    return {"narrator_json": narrator_json, "fingerprint": fp}
+
+
+def run_builder(job: sqlite3.Row) -> Dict[str, Any]:
+    meta = json.loads(job["narrator_json"] or "{}")
+    build_result = call_builder(meta)
+    return {
+        "post_id": build_result.get("post_id"),
+        "link": build_result.get("link"),
+        "last_error": None,
+    }
+
+
+STAGE_HANDLERS = {
+    "downloader": run_downloader,
+    "narrator": run_narrator,
+    "builder": run_builder,
+}
 
 
 # --------------- Worker loop ---------------
-def worker():
-    print("[Worker] started")
+def process_job(stage: str, job: sqlite3.Row):
+    """Exécute une étape puis fait passer le job dans la file suivante"""
+    cfg = STAGES[stage]
+    started = time.time()
+    # next_attempt_at = moment où le job est devenu éligible dans cette file
+    queue_wait = max(0.0, started - job["next_attempt_at"]) if job["next_attempt_at"] else None
+    if queue_wait is not None:
+        QUEUE_WAIT.observe(queue_wait, stage)
     
-    while True:
+    try:
+        fields = STAGE_HANDLERS[stage](job)
+    except Exception:
+        STAGE_DURATION.observe(time.time() - started, stage, "error")
+        raise
+    duration = time.time() - started
+    STAGE_DURATION.observe(duration, stage, "ok")
+    STAGE_RETRIES.observe(job["attempts"], stage)
+    finished = cfg["output"] == "done"
+    
+    # Timings conservés par job (secondes)
+    timings = json.loads(job["timings"] or "{}")
+    timings[stage] = round(duration, 4)
+    if queue_wait is not None:
+        timings[f"{stage}_queue_wait"] = round(queue_wait, 4)
+    timings[f"{stage}_attempts"] = job["attempts"] + 1
+    if finished and job["enqueued_at"]:
+        timings["end_to_end"] = round(time.time() - job["enqueued_at"], 4)
+    fields["timings"] = json.dumps(timings)
+    
+    with db() as c:
+        # Le job entre dans la file suivante, compteur de tentatives remis à zéro.
+        # Si le lease a été repris entre-temps, un autre worker possède le job.
+        owned = _update_job(
+            c, job["id"], cfg["output"], fence=job["claim_token"],
+            claim_token=None, lease_expires_at=None,
+            attempts=0, next_attempt_at=time.time(), **fields
+        )
+        if owned and finished:
+            # Même transaction que le 'done' : aucune notification perdue
+            enqueue_notifications(c, job, fields.get("link"))
+    
+    if not owned:
+        print(f"[Worker] ⚠️ job #{job['id']} lease lost during {stage}, result discarded")
+    elif finished:
+        record_drained(job["lane"])
+        if "end_to_end" in timings:
+            END_TO_END.observe(timings["end_to_end"])
+        _outbox_wakeup.set()
+        print(f"[Worker] ✅ job #{job['id']} DONE → post_id={fields.get('post_id')} | {fields.get('link')}")
+    else:
+        wake_workers(STAGE_BY_INPUT[cfg["output"]])
+
+
+def fail_job(stage: str, job: sqlite3.Row, msg: str):
+    """Replanifie l'étape avec backoff, ou passe le job en 'error' après JOB_MAX_ATTEMPTS"""
+    attempts = job["attempts"] + 1
+    error = f"{stage}: {msg}"
+    released = {"fence": job["claim_token"], "claim_token": None, "lease_expires_at": None}
+    if attempts >= JOB_MAX_ATTEMPTS:
+        if set_status(job["id"], "error", attempts=attempts, last_error=error, **released):
+            record_drained(job["lane"])
+        print(f"[Worker] ❌ job #{job['id']} failed after {attempts} attempt(s): {msg}")
+        return
+    
+    delay = backoff_delay(attempts, JOB_RETRY_BASE_SEC, JOB_RETRY_MAX_SEC)
+    set_status(
+        job["id"], STAGES[stage]["input"],
+        attempts=attempts, next_attempt_at=time.time() + delay, last_error=error, **released
+    )
+    print(f"[Worker] ↻ job #{job['id']} {stage} attempt {attempts}/{JOB_MAX_ATTEMPTS} failed, retry in {delay:.1f}s")
+
+
+def worker(stage: str = "narrator", worker_id: int = 0):
+    name = f"{stage}-{worker_id}"
+    print(f"[Worker {name}] started")
+    
+    while not _shutdown.is_set():
+        job = None
+        seen = _stage_seq[stage]
         try:
-            job = next_queued()
+            job = claim_next(stage)
             if not job:
-                time.sleep(WORKER_INTERVAL)
+                # File vide : on dort jusqu'au prochain job (polling en secours)
+                wait_for_work(stage, seen, WORKER_INTERVAL)
                 continue
             
-            job_id = job["id"]
-            file_path = job["file"]
-            
-            print(f"[Worker] processing job #{job_id} → {file_path}")
-            set_status(job_id, "running")
-            
-            # 1) Narrator
-            meta = call_narrator(file_path)
-            safe_meta = json.dumps(meta, ensure_ascii=False)
-            set_status(job_id, "running", narrator_json=safe_meta)
-            
-            # 2) Builder
-            build_result = call_builder(meta)
-            post_id = build_result.get("post_id")
-            link = build_result.get("link")
-            
-            set_status(job_id, "done", post_id=post_id, link=link, last_error=None)
-            
-            print(f"[Worker] ✅ job #{job_id} DONE → post_id={post_id} | {link}")
-            
-            # 3) Notify Publisher
-            notify_publisher(meta.get("title", "New content"), link or "")
+            print(f"[Worker {name}] job #{job['id']} → {job['file']}")
+            with hold_lease(job):
+                process_job(stage, job)
             
         except Exception as e:
             msg = str(e)[:800]
-            try:
-                set_status(job_id, "error", last_error=msg)
-            except Exception:
-                pass
-            print(f"[Worker] ⚠️ error: {msg}")
-        
-        time.sleep(WORKER_INTERVAL)
+            if job is not None:
+                try:
+                    fail_job(stage, job, msg)
+                except Exception:
+                    pass
+            print(f"[Worker {name}] ⚠️ error: {msg}")
+            if job is None:
+                # Erreur DB pendant le claim : on évite de boucler à vide
+                _shutdown.wait(WORKER_INTERVAL)
+
+
+def start_workers(concurrency: Optional[Dict[str, int]] = None):
+    """Démarre les pools de workers de chaque étape et la livraison outbox.
+
+    `concurrency` surcharge le nombre de workers par étape ; la clé
+    "publisher" règle les livraisons outbox en parallèle (0 = désactivée).
+    """
+    concurrency = concurrency or {}
+    _shutdown.clear()
+    for stage, cfg in STAGES.items():
+        count = concurrency.get(stage, cfg["concurrency"])
+        for i in range(count):
+            t = threading.Thread(
+                target=worker, args=(stage, i), name=f"gateway-{stage}-{i}", daemon=True
+            )
+            t.start()
+            _workers.append(t)
+        print(f"[Worker] {stage} pool started: {count} worker(s)")
+    
+    publishers = concurrency.get("publisher", PUBLISHER_CONCURRENCY)
+    if publishers:
+        t = threading.Thread(target=outbox_loop, args=(publishers,), name="gateway-outbox", daemon=True)
+        t.start()
+        _workers.append(t)
+    
+    t = threading.Thread(target=maintenance_loop, name="gateway-maintenance", daemon=True)
+    t.start()
+    _workers.append(t)
+
+
+def stop_workers(timeout: float = 5.0):
+    """Arrête les pools : les workers finissent leur job en cours puis sortent"""
+    _shutdown.set()
+    _outbox_wakeup.set()
+    for cv in _stage_cv.values():
+        with cv:
+            cv.notify_all()
+    for t in _workers:
+        t.join(timeout)
+    _workers.clear()
 
 
 # --------------- API ----------------
 @app.on_event("startup")
 def _boot():
     init_db()
-    threading.Thread(target=worker, daemon=True).start()
+    start_workers()
+
+
+@app.on_event("shutdown")
+def _stop():
+    stop_workers()
+    close_sessions()
 
 
 @app.get("/")
@@ -197,7 +1797,9 @@ def index():
         "status": "gateway online",
         "narrator": NARRATOR_URL,
         "builder": BUILDER_URL,
-        "publisher": PUBLISHER_URL
+        "publisher": PUBLISHER_URL,
+        "workers": {name: cfg["concurrency"] for name, cfg in STAGES.items()},
+        "publisher_concurrency": PUBLISHER_CONCURRENCY
     }
 
 
@@ -206,73 +1808,233 @@ async def create_event(request: Request):
     """Create new job from event"""
     try:
         data = await request.json()
-        
-        # ✅ FIX: Log payload reçu pour debug
-        print(f"📦 Received payload: {data}")
-        
-        # ✅ FIX: Validation flexible des champs
-        event_type = data.get("event")
-        file_path = data.get("file")
-        
-        if not event_type or not file_path:
-            print(f"❌ Missing fields. event={event_type}, file={file_path}")
-            return {
-                "ok": False,
-                "error": "Missing required fields: 'event' and 'file' are required"
-            }
-        
-        # Champs optionnels
-        title = data.get("title", "Untitled")
-        timestamp = data.get("timestamp")
-        
-        # Créer job ID unique
-        import uuid
-        job_id = str(uuid.uuid4())
-        
-        # Insérer dans DB
-        import time
-        db_conn = db()
-        db_conn.execute("""
-            INSERT INTO jobs (id, file, title, status, timestamp, created_at)
-            VALUES (?, ?, ?, 'queued', ?, ?)
-        """, (job_id, file_path, title, timestamp or time.time(), time.time()))
-        db_conn.commit()
-        
-        print(f"✅ Job created: {job_id}")
-        
-        return {
-            "ok": True,
-            "job_id": job_id,
-            "message": f"Job queued: {title}"
-        }
-        
     except json.JSONDecodeError as e:
         print(f"❌ Invalid JSON: {e}")
         return {"ok": False, "error": "Invalid JSON payload"}
+    
+    print(f"📦 Received payload: {data}")
+    try:
+        event = JobEvent.from_payload(data)
+    except ValueError as e:
+        print(f"❌ Invalid event: {e}")
+        return {"ok": False, "error": str(e)}
+    
+    # SQLite (COUNT de file, insertion) hors de la boucle d'événements :
+    # une écriture en attente du verrou ne bloque ni les requêtes ni /jobs/stream
+    rejected = await run_in_threadpool(admit, event_source(request, data), [event.lane])
+    if rejected:
+        return rejected
+    
+    try:
+        job_id = (await run_in_threadpool(insert_jobs, [event]))[0]
     except Exception as e:
         print(f"❌ Error creating job: {e}")
-        import traceback
-        traceback.print_exc()
         return {"ok": False, "error": str(e)}
+    
+    print(f"✅ Job created: #{job_id}")
+    return {
+        "ok": True,
+        "job_id": job_id,
+        "message": f"Job queued: {event.title or os.path.basename(event.file)}"
+    }
+
+
+@app.post("/events/batch")
+async def create_events_batch(request: Request):
+    """Create jobs from a batch of events in a single transaction.
+
+    Body: {"events": [{"event": ..., "file": ..., "idempotency_key": ...}, ...]}
+    (or the bare list). Job IDs are returned in input order.
+    """
+    try:
+        data = await request.json()
+    except json.JSONDecodeError:
+        return {"ok": False, "error": "Invalid JSON payload"}
+    
+    events = data.get("events") if isinstance(data, dict) else data
+    if not isinstance(events, list) or not events:
+        return {"ok": False, "error": "'events' must be a non-empty list"}
+    if len(events) > MAX_BATCH_EVENTS:
+        return {"ok": False, "error": f"Too many events (max {MAX_BATCH_EVENTS})"}
+    
+    parsed = []
+    for i, e in enumerate(events):
+        try:
+            parsed.append(JobEvent.from_payload(e))
+        except ValueError as err:
+            return {"ok": False, "error": f"Event #{i}: {err}", "index": i}
+    
+    rejected = await run_in_threadpool(admit, event_source(request, data), [e.lane for e in parsed])
+    if rejected:
+        return rejected
+    
+    try:
+        job_ids = await run_in_threadpool(insert_jobs, parsed)
+    except Exception as e:
+        print(f"❌ Error creating batch: {e}")
+        return {"ok": False, "error": str(e)}
+    
+    print(f"✅ Batch queued: {len(events)} event(s)")
+    return {"ok": True, "job_ids": job_ids, "count": len(job_ids)}
+
+
+@app.get("/queue")
+def queue_status():
+    """Profondeur de la file par lane, limites et débit de vidage : les
+    producteurs (Curator, backfills) peuvent s'auto-réguler avant le 429."""
+    depths = queue_depths()
+    lanes = {
+        lane: {
+            "depth": depths.get(lane, 0),
+            "max_depth": LANE_MAX_DEPTH.get(lane) or None,
+            "drain_per_sec": round(drain_rate(lane), 4),
+            "weight": LANE_WEIGHTS.get(lane),
+        }
+        for lane in sorted(set(LANE_WEIGHTS) | set(depths))
+    }
+    return {
+        "ok": True,
+        "depth": sum(depths.values()),
+        "max_depth": MAX_QUEUE_DEPTH or None,
+        "drain_per_sec": round(drain_rate(), 4),
+        "lanes": lanes,
+    }
+
+
+def _parse_since(since: str) -> int:
+    if not since.isdigit():
+        raise HTTPException(status_code=400, detail="Invalid 'since' cursor (expected a job event id)")
+    return int(since)
+
+
+# Changements depuis un curseur : jobs ayant une transition (job_events) dans
+# ]since, snapshot], ordonnés par leur dernière transition. Les id de
+# job_events sont attribués sous le verrou d'écriture : l'ordre des id suit
+# l'ordre des commits, contrairement à updated_at (horodaté avant le verrou).
+_JOBS_SINCE_SQL = """
+    SELECT jobs.*, e.event_id AS _event_id
+      FROM (SELECT job_id, MAX(id) AS event_id FROM job_events
+             WHERE id > ? AND id <= ? GROUP BY job_id) AS e
+      JOIN jobs ON jobs.id = e.job_id
+     {where}
+     ORDER BY e.event_id ASC
+     LIMIT ?
+"""
 
 
 @app.get("/jobs")
-def list_jobs(limit: int = 50):
+def list_jobs(
+    response: Response,
+    limit: int = 50,
+    status: Optional[str] = None,
+    cursor: Optional[int] = None,
+    since: Optional[str] = None
+):
+    """List jobs with keyset pagination.
+
+    - default: newest first; pass the `X-Next-Cursor` header value back as
+      `cursor` to get the next (older) page.
+    - `since`: only jobs with a status transition after this cursor (a
+      job_events id), oldest change first; poll again with the
+      `X-Since-Cursor` header value. 410 if the cursor predates the retained
+      job_events (reload without `since`).
+    - `status`: comma-separated status filter (e.g. `queued,error`).
+
+    The body stays a plain list of jobs.
+    """
+    limit = max(1, min(limit, MAX_JOBS_PAGE))
+    where, params = [], []
+    
+    statuses = [s.strip() for s in (status or "").split(",") if s.strip()]
+    if statuses:
+        where.append(f"jobs.status IN ({','.join('?' * len(statuses))})")
+        params.extend(statuses)
+    
+    if since:
+        after = _parse_since(since)
+        with db() as c:
+            # Borne haute lue d'abord : un commit concurrent sera vu au prochain appel
+            latest, oldest = c.execute("SELECT COALESCE(MAX(id), 0), MIN(id) FROM job_events").fetchone()
+            if oldest is not None and after < oldest - 1 and after < latest:
+                # Transitions purgées (JOB_EVENTS_RETENTION) : le client doit recharger
+                raise HTTPException(status_code=410, detail="'since' cursor expired, reload without 'since'")
+            sql = _JOBS_SINCE_SQL.format(where=("WHERE " + " AND ".join(where)) if where else "")
+            rows = c.execute(sql, [after, latest] + params + [limit]).fetchall()
+        # Page pleine : reprise après la dernière transition rendue ; sinon tout
+        # ce qui précède le snapshot a été vu
+        next_since = rows[-1]["_event_id"] if len(rows) == limit else max(after, latest)
+        response.headers["X-Since-Cursor"] = str(next_since)
+        return [{k: r[k] for k in r.keys() if k != "_event_id"} for r in rows]
+    
+    if cursor is not None:
+        where.append("id < ?")
+        params.append(cursor)
+    sql = "SELECT * FROM jobs"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY id DESC LIMIT ?"
+    params.append(limit)
+    
     with db() as c:
-        rows = c.execute(
-            "SELECT * FROM jobs ORDER BY id DESC LIMIT ?",
-            (limit,)
-        ).fetchall()
-        return [dict(r) for r in rows]
+        # Lu avant la page : un changement concurrent sera vu au prochain `since`
+        latest = c.execute("SELECT COALESCE(MAX(id), 0) FROM job_events").fetchone()[0]
+        rows = c.execute(sql, params).fetchall()
+    
+    if len(rows) == limit:
+        response.headers["X-Next-Cursor"] = str(rows[-1]["id"])
+    response.headers["X-Since-Cursor"] = str(latest)
+    return [dict(r) for r in rows]
+
+
+@app.get("/jobs/stream")
+async def stream_jobs(request: Request, last_event_id: Optional[int] = None):
+    """Server-Sent Events: one `job` event per status transition.
+
+    Resumes after `last_event_id` (query param or the `Last-Event-ID` header
+    sent by EventSource on reconnect); otherwise streams new transitions only.
+    """
+    header = request.headers.get("last-event-id")
+    if header and header.isdigit():
+        last_event_id = int(header)
+    return StreamingResponse(
+        job_event_stream(last_event_id, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @app.get("/jobs/{job_id}")
 def get_job(job_id: int):
     with db() as c:
         r = c.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
-        if not r:
-            return {"error": "not found"}
+    if r:
         return dict(r)
+    # Job terminé depuis longtemps : lu dans l'archive froide
+    return get_archived_job(job_id) or {"error": "not found"}
+
+
+@app.post("/jobs/{job_id}/requeue")
+def requeue(job_id: int):
+    """Re-run a finished (done / error) job as a new job"""
+    try:
+        new_id = requeue_job(job_id)
+    except ValueError as e:
+        return {"ok": False, "error": str(e)}
+    if new_id is None:
+        return {"ok": False, "error": "not found"}
+    return {"ok": True, "job_id": new_id, "requeued_from": job_id}
+
+
+@app.get("/cache/stats")
+def get_cache_stats():
+    """Narrator cache hit/miss counters (since process start) and size"""
+    return cache_stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text exposition: queue wait, stage duration, retries, end-to-end"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
 
 @app.get("/health")
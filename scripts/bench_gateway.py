@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""End-to-end load benchmark for the Gateway pipeline.
+
+Starts local stub Narrator, Builder and Publisher HTTP servers with
+configurable latency and error distributions, points an in-process Gateway
+(temporary SQLite DB, real worker pools, real HTTP calls to the stubs) at
+them, fires N events through /events/batch (or /event) and waits for every job to reach
+`done` or `error`. Reports:
+
+- throughput (jobs/sec, from first event to last terminal job)
+- queue-wait percentiles per stage (narrator, builder)
+- end-to-end percentiles (enqueue → done)
+- stub call counts and outbox deliveries
+
+Latency specs (milliseconds): `fixed:50`, `uniform:20-80`, `exp:50`
+(exponential with that mean). Error rates are the fraction of calls that
+return HTTP 500 (retried by the Gateway with backoff).
+
+Usage (from the repository root):
+  python scripts/bench_gateway.py --events 500 --narrator-latency exp:200 \\
+      --builder-latency uniform:50-150 --builder-errors 0.02
+
+Gateway settings (worker counts, limiter, WAL...) come from the usual env
+vars, e.g. `NARRATOR_CONCURRENCY=8 BUILDER_CONCURRENCY=4 python ...`; the
+`--*-workers` flags override the pool sizes for a run.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import gateway.gateway as gateway  # noqa: E402
+
+
+def parse_latency(spec: str):
+    """'fixed:50' | 'uniform:20-80' | 'exp:50' (ms) → fonction qui tire une latence en secondes"""
+    kind, _, value = spec.partition(":")
+    if kind == "fixed":
+        ms = float(value or 0)
+        return lambda: ms / 1000
+    if kind == "uniform":
+        low, _, high = value.partition("-")
+        low, high = float(low), float(high or low)
+        return lambda: random.uniform(low, high) / 1000
+    if kind == "exp":
+        mean = float(value)
+        return lambda: random.expovariate(1 / mean) / 1000 if mean > 0 else 0.0
+    raise ValueError(f"Invalid latency spec '{spec}' (fixed:MS, uniform:MIN-MAX, exp:MEAN)")
+
+
+class StubServer:
+    """Serveur HTTP local qui simule un service en aval"""
+
+    def __init__(self, name: str, latency, error_rate: float, respond):
+        self.name, self.calls, self.errors = name, 0, 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                time.sleep(latency())
+                with stub._lock:
+                    stub.calls += 1
+                    failed = random.random() < error_rate
+                    stub.errors += failed
+                status, payload = (500, {"error": "stub failure"}) if failed else (200, respond(body))
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self.thread = threading.Thread(target=self.server.serve_forever, name=f"stub-{name}", daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def percentiles(values, points=(50, 90, 99)):
+    if not values:
+        return {f"p{p}": None for p in points}
+    ordered = sorted(values)
+    return {
+        f"p{p}": round(ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))], 4)
+        for p in points
+    }
+
+
+def _counter():
+    n = [0]
+    lock = threading.Lock()
+
+    def next_id():
+        with lock:
+            n[0] += 1
+            return n[0]
+    return next_id
+
+
+def run_benchmark(events: int = 200, batch_size: int = 100,
+                  narrator_latency: str = "fixed:50", builder_latency: str = "fixed:50",
+                  publisher_latency: str = "fixed:5",
+                  narrator_errors: float = 0.0, builder_errors: float = 0.0,
+                  publisher_errors: float = 0.0,
+                  workers: dict = None, retry_base_sec: float = 0.05,
+                  timeout: float = 600.0, db_path: str = None, quiet: bool = True) -> dict:
+    """Lance un run complet et retourne le rapport (dict).
+
+    `quiet` masque les logs des workers pendant le run.
+    """
+    if quiet:
+        with redirect_stdout(io.StringIO()):
+            return run_benchmark(
+                events, batch_size, narrator_latency, builder_latency, publisher_latency,
+                narrator_errors, builder_errors, publisher_errors, workers, retry_base_sec,
+                timeout, db_path, quiet=False
+            )
+    post_id = _counter()
+    stubs = {
+        "narrator": StubServer(
+            "narrator", parse_latency(narrator_latency), narrator_errors,
+            lambda body: {"title": "Bench", "description": "stub", "tags": ["bench"]}
+        ),
+        "builder": StubServer(
+            "builder", parse_latency(builder_latency), builder_errors,
+            lambda body: (lambda i: {"post_id": i, "link": f"https://bench.local/p/{i}"})(post_id())
+        ),
+        "publisher": StubServer(
+            "publisher", parse_latency(publisher_latency), publisher_errors, lambda body: {"ok": True}
+        ),
+    }
+
+    tmpdir = None
+    if db_path is None:
+        tmpdir = tempfile.TemporaryDirectory(prefix="gateway-bench-")
+        db_path = os.path.join(tmpdir.name, "bench.db")
+
+    # Gateway en process, pointée sur les stubs ; admission control coupé
+    # (on mesure le pipeline, pas le 429)
+    saved = {name: getattr(gateway, name) for name in (
+        "DB_PATH", "NARRATOR_URL", "BUILDER_URL", "OUTBOX_TARGETS", "MAX_QUEUE_DEPTH",
+        "LANE_MAX_DEPTH", "SOURCE_RATE_PER_SEC", "JOB_RETRY_BASE_SEC", "OUTBOX_RETRY_BASE_SEC",
+        "NARRATOR_CACHE_ENABLED"
+    )}
+    for stub in stubs.values():
+        stub.__enter__()
+    try:
+        gateway.DB_PATH = db_path
+        gateway.NARRATOR_URL = stubs["narrator"].url + "/describe"
+        gateway.BUILDER_URL = stubs["builder"].url + "/build"
+        gateway.OUTBOX_TARGETS = {
+            "notify": (stubs["publisher"].url + "/notify", saved["OUTBOX_TARGETS"]["notify"][1]),
+            "social": (stubs["publisher"].url + "/social/publish", saved["OUTBOX_TARGETS"]["social"][1]),
+        }
+        gateway.MAX_QUEUE_DEPTH = 0
+        gateway.LANE_MAX_DEPTH = {}
+        gateway.SOURCE_RATE_PER_SEC = 0
+        gateway.JOB_RETRY_BASE_SEC = retry_base_sec
+        gateway.OUTBOX_RETRY_BASE_SEC = retry_base_sec
+        gateway.NARRATOR_CACHE_ENABLED = False
+        gateway.init_db()
+        gateway.start_workers(workers or {})
+        client = TestClient(gateway.app)
+
+        started = time.time()
+        fired = 0
+        while fired < events:
+            n = min(max(1, batch_size), events - fired)
+            payload = [{"event": "new_video", "file": f"/bench/video-{fired + i}.mp4"} for i in range(n)]
+            # --batch-size 1 : un POST /event par événement
+            if batch_size <= 1:
+                r = client.post("/event", json=payload[0])
+            else:
+                r = client.post("/events/batch", json=payload)
+            body = r.json()
+            if not body.get("ok"):
+                raise RuntimeError(f"Ingest failed: {body}")
+            fired += n
+        ingest_sec = time.time() - started
+
+        # Attente : tous les jobs terminés et l'outbox vidée
+        deadline = started + timeout
+        jobs_done_at = None
+        while True:
+            with gateway.db() as c:
+                pending = c.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status NOT IN ('done', 'error')"
+                ).fetchone()[0]
+                outbox = c.execute(
+                    "SELECT COUNT(*) FROM outbox WHERE status IN ('pending', 'sending')"
+                ).fetchone()[0]
+            if pending == 0 and jobs_done_at is None:
+                jobs_done_at = time.time()
+            if pending == 0 and outbox == 0:
+                break
+            if time.time() > deadline:
+                raise TimeoutError(f"{pending} job(s) still running after {timeout}s")
+            time.sleep(0.05)
+
+        with gateway.db() as c:
+            rows = c.execute("SELECT status, timings FROM jobs").fetchall()
+            sent = c.execute("SELECT COUNT(*) FROM outbox WHERE status = 'sent'").fetchone()[0]
+    finally:
+        gateway.stop_workers()
+        for name, value in saved.items():
+            setattr(gateway, name, value)
+        for stub in stubs.values():
+            stub.__exit__(None, None, None)
+        if tmpdir is not None:
+            tmpdir.cleanup()
+
+    timings = [json.loads(r["timings"] or "{}") for r in rows]
+    done = sum(1 for r in rows if r["status"] == "done")
+    # Durée du run : du premier événement au dernier job terminé (à 50 ms près)
+    wall = jobs_done_at - started
+    return {
+        "events": events,
+        "done": done,
+        "error": len(rows) - done,
+        "wall_sec": round(wall, 3),
+        "ingest_sec": round(ingest_sec, 3),
+        "ingest_events_per_sec": round(events / ingest_sec, 1) if ingest_sec else 0.0,
+        "jobs_per_sec": round(done / wall, 2) if wall else 0.0,
+        "queue_wait_sec": {
+            stage: percentiles([t[f"{stage}_queue_wait"] for t in timings if f"{stage}_queue_wait" in t])
+            for stage in gateway.STAGES
+            if any(f"{stage}_queue_wait" in t for t in timings)
+        },
+        "end_to_end_sec": percentiles([t["end_to_end"] for t in timings if "end_to_end" in t]),
+        "stub_calls": {name: {"calls": s.calls, "errors": s.errors} for name, s in stubs.items()},
+        "outbox_sent": sent,
+    }
+
+
+def print_report(report: dict):
+    print(f"Events:        {report['events']} ({report['done']} done, {report['error']} error)")
+    print(f"Wall time:     {report['wall_sec']} s (ingest {report['ingest_sec']} s, "
+          f"{report['ingest_events_per_sec']} events/s)")
+    print(f"Throughput:    {report['jobs_per_sec']} jobs/s")
+    for stage, pct in report["queue_wait_sec"].items():
+        print(f"Queue wait {stage:<9} p50={pct['p50']}  p90={pct['p90']}  p99={pct['p99']}")
+    pct = report["end_to_end_sec"]
+    print(f"End-to-end           p50={pct['p50']}  p90={pct['p90']}  p99={pct['p99']}")
+    for name, s in report["stub_calls"].items():
+        print(f"Stub {name:<10} {s['calls']} call(s), {s['errors']} injected error(s)")
+    print(f"Outbox sent:   {report['outbox_sent']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gateway end-to-end load benchmark with stub downstreams")
+    parser.add_argument("--events", type=int, default=200, help="Number of events to fire")
+    parser.add_argument("--batch-size", type=int, default=100, help="Events per /events/batch request (1 = one POST /event per event)")
+    parser.add_argument("--narrator-latency", default="fixed:50", help="Narrator stub latency spec (ms)")
+    parser.add_argument("--builder-latency", default="fixed:50", help="Builder stub latency spec (ms)")
+    parser.add_argument("--publisher-latency", default="fixed:5", help="Publisher stub latency spec (ms)")
+    parser.add_argument("--narrator-errors", type=float, default=0.0, help="Narrator stub error rate (0-1)")
+    parser.add_argument("--builder-errors", type=float, default=0.0, help="Builder stub error rate (0-1)")
+    parser.add_argument("--publisher-errors", type=float, default=0.0, help="Publisher stub error rate (0-1)")
+    parser.add_argument("--narrator-workers", type=int, help="Override NARRATOR_CONCURRENCY")
+    parser.add_argument("--builder-workers", type=int, help="Override BUILDER_CONCURRENCY")
+    parser.add_argument("--publisher-workers", type=int, help="Override PUBLISHER_CONCURRENCY")
+    parser.add_argument("--retry-base", type=float, default=0.05, help="Retry backoff base (seconds)")
+    parser.add_argument("--timeout", type=float, default=600, help="Max seconds to wait for the run")
+    parser.add_argument("--db", help="SQLite path (default: temporary file)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--verbose", action="store_true", help="Show Gateway worker logs")
+    args = parser.parse_args()
+
+    workers = {
+        stage: n for stage, n in (("narrator", args.narrator_workers), ("builder", args.builder_workers),
+                                  ("publisher", args.publisher_workers)) if n is not None
+    }
+    report = run_benchmark(
+        events=args.events, batch_size=args.batch_size,
+        narrator_latency=args.narrator_latency, builder_latency=args.builder_latency,
+        publisher_latency=args.publisher_latency, narrator_errors=args.narrator_errors,
+        builder_errors=args.builder_errors, publisher_errors=args.publisher_errors,
+        workers=workers, retry_base_sec=args.retry_base, timeout=args.timeout, db_path=args.db,
+        quiet=not args.verbose
+    )
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    return 0 if report["error"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -110,15 +110,61 @@ if _should_autostart():
 
 
 # ---------- Helpers ----------
+# Cache local des jobs : après le premier chargement, on ne demande au
+# Gateway que les jobs modifiés depuis le dernier curseur (`since`).
+# Sentinel ne lit les jobs qu'à la demande (dashboard, analyse IA) : ce delta
+# remplace le polling complet sans garder une connexion /jobs/stream ouverte.
+_jobs_cache: Dict[int, Dict[str, Any]] = {}
+_jobs_since: Optional[str] = None
+_jobs_window = 0
+_jobs_lock = threading.Lock()
+JOBS_CACHE_MAX = 1000
+
+
+def _get_jobs(params: Dict[str, Any]) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+    r = requests.get(f"{GATEWAY_URL}/jobs", params=params, timeout=5)
+    r.raise_for_status()
+    data = r.json()
+    return (data if isinstance(data, list) else None), r.headers.get("X-Since-Cursor")
+
+
 def fetch_jobs(limit: int = 100) -> List[Dict[str, Any]]:
     """Fetch jobs from Gateway API instead of direct DB access"""
+    global _jobs_since, _jobs_window
     try:
-        r = requests.get(f"{GATEWAY_URL}/jobs", params={"limit": limit}, timeout=5)
-        r.raise_for_status()
-        data = r.json()
-        if isinstance(data, list):
-            return data
-        return []
+        with _jobs_lock:
+            if _jobs_since is None or limit > _jobs_window:
+                # Chargement complet : premier appel, fenêtre plus large,
+                # ou Gateway sans curseur de changements
+                jobs, cursor = _get_jobs({"limit": limit})
+                if jobs is None:
+                    return []
+                _jobs_cache.clear()
+                changed = jobs
+                _jobs_since, _jobs_window = cursor, limit
+            else:
+                changed = []
+                for _ in range(10):
+                    try:
+                        page, cursor = _get_jobs({"since": _jobs_since, "limit": 500})
+                    except requests.HTTPError as e:
+                        if e.response is not None and e.response.status_code in (400, 410):
+                            # Curseur expiré ou d'un ancien format : rechargement complet au prochain appel
+                            _jobs_since = None
+                        raise
+                    if page is None:
+                        return []
+                    changed.extend(page)
+                    _jobs_since = cursor or _jobs_since
+                    if len(page) < 500:
+                        break
+            
+            for job in changed:
+                _jobs_cache[job["id"]] = job
+            newest = sorted(_jobs_cache, reverse=True)
+            for job_id in newest[JOBS_CACHE_MAX:]:
+                del _jobs_cache[job_id]
+            return [_jobs_cache[job_id] for job_id in newest[:limit]]
     except Exception as e:
         print(f"[Sentinel] Error fetching jobs: {e}")
         return []
@@ -579,14 +625,30 @@ class SentinelAutoFix:
                     ]
                 }
 
-            # Attempt auto sync
+            # Attempt auto sync (background job on the Curator side)
             sync_url = f"{CURATOR_URL.rstrip('/')}/sync/bunny"
-            sync_resp = requests.post(sync_url, timeout=60)
+            sync_resp = requests.post(sync_url, timeout=10)
             try:
                 sync_json = sync_resp.json()
             except Exception:
                 sync_json = None
 
+            # Wait for the sync job to finish before re-checking
+            sync_id = (sync_json or {}).get("sync_id")
+            if sync_id:
+                deadline = time.time() + float(os.environ.get('SENTINEL_SYNC_WAIT_SEC', '30'))
+                while time.time() < deadline:
+                    time.sleep(2)
+                    try:
+                        status = requests.get(f"{CURATOR_URL.rstrip('/')}/sync/{sync_id}", timeout=5).json()
+                    except Exception as e:
+                        # Transient poll failure: keep waiting until the deadline
+                        print(f"[Sentinel] sync {sync_id} status check failed: {e}")
+                        continue
+                    if status.get("status") != "running":
+                        sync_json = status
+                        break
+
             # Immediately re-check video
             r2 = requests.get(curator_video_url, timeout=5)
             if r2.status_code == 200:
@@ -1156,8 +1218,9 @@ def _read_audit_log(request: Request, log_name: str, lines: int = 200):
 
 # Endpoint auto-diagnostic
 @app.get("/api/autofix")
-async def autofix():
+def autofix():
     """Diagnostic automatique + tentative de correction"""
+    # def (pas async) : diagnose_system fait des appels HTTP bloquants, FastAPI l'exécute dans le threadpool
     sentinel = SentinelAutoFix()
     results = sentinel.diagnose_system()
     
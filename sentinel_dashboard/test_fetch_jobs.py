@@ -0,0 +1,53 @@
+import sentinel_dashboard.sentinel as sentinel
+
+
+def test_fetch_jobs_polls_only_changes_after_first_load(monkeypatch):
+    calls = []
+
+    class DummyResp:
+        def __init__(self, jobs, cursor):
+            self._jobs = jobs
+            self.headers = {"X-Since-Cursor": cursor}
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return self._jobs
+
+    def fake_get(url, params=None, timeout=None):
+        calls.append(params)
+        if "since" not in params:
+            return DummyResp([{"id": 2, "status": "queued"}, {"id": 1, "status": "done"}], "t1|2")
+        return DummyResp([{"id": 2, "status": "done"}, {"id": 3, "status": "queued"}], "t2|3")
+
+    monkeypatch.setattr('requests.get', fake_get)
+    monkeypatch.setattr(sentinel, "_jobs_cache", {})
+    monkeypatch.setattr(sentinel, "_jobs_since", None)
+    monkeypatch.setattr(sentinel, "_jobs_window", 0)
+
+    assert [j["id"] for j in sentinel.fetch_jobs(limit=100)] == [2, 1]
+    jobs = sentinel.fetch_jobs(limit=100)
+
+    assert calls[1] == {"since": "t1|2", "limit": 500}
+    assert [(j["id"], j["status"]) for j in jobs] == [(3, "queued"), (2, "done"), (1, "done")]
+    assert sentinel._jobs_since == "t2|3"
+
+
+def test_fetch_jobs_reloads_when_since_cursor_expires(monkeypatch):
+    import requests
+
+    class Gone:
+        headers = {}
+        status_code = 410
+
+        def raise_for_status(self):
+            raise requests.HTTPError(response=self)
+
+    monkeypatch.setattr('requests.get', lambda url, params=None, timeout=None: Gone())
+    monkeypatch.setattr(sentinel, "_jobs_cache", {1: {"id": 1, "status": "queued"}})
+    monkeypatch.setattr(sentinel, "_jobs_since", "41")
+    monkeypatch.setattr(sentinel, "_jobs_window", 100)
+
+    assert sentinel.fetch_jobs(limit=100) == []
+    assert sentinel._jobs_since is None
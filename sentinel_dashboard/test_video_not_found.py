@@ -73,3 +73,41 @@ def test_auto_fix_video_not_found_with_empty_db(monkeypatch):
     assert fix is not None
     assert fix.get('auto_fixed') is True
     assert 'became available' in fix.get('message', '')
+
+
+def test_auto_fix_video_not_found_keeps_polling_after_transient_errors(monkeypatch):
+    # POST /sync/bunny returns a sync_id; the first status poll fails, the next one reports done
+    polls = []
+
+    class Resp:
+        def __init__(self, status_code, body):
+            self.status_code = status_code
+            self.text = str(body)
+            self._body = body
+        def json(self):
+            return self._body
+
+    def fake_get(url, timeout=None, **kwargs):
+        if '/sync/' in url:
+            polls.append(url)
+            if len(polls) == 1:
+                raise ConnectionError("curator restarting")
+            return Resp(200, {"sync_id": "s1", "status": "done"})
+        if url.endswith('/videos/134'):
+            return Resp(200 if polls else 404, {"id": 134})
+        return Resp(200, [])
+
+    def fake_post(url, timeout=None, **kwargs):
+        return Resp(202, {"sync_id": "s1", "status": "running"})
+
+    monkeypatch.setenv('SENTINEL_WATCH_TEST_VIDEO_ID', '134')
+    monkeypatch.setenv('SENTINEL_AUTO_FIX_VIDEO_NOT_FOUND', 'true')
+    monkeypatch.setenv('CURATOR_URL', 'https://only-curator.onrender.com')
+    monkeypatch.setattr('requests.get', fake_get)
+    monkeypatch.setattr('requests.post', fake_post)
+    monkeypatch.setattr('time.sleep', lambda s: None)
+
+    fix = SentinelAutoFix()._fix_video_not_found()
+    assert len(polls) == 2
+    assert fix.get('auto_fixed') is True
+    assert fix['details'].get('status') == 'done'
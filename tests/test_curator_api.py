@@ -47,3 +47,291 @@ def test_get_video_exists(tmp_path):
     assert data["bunny_video_id"] == "test-guid-xyz"
     # views should exist and default to 0
     assert isinstance(data.get("view_count", 0), int)
+
+
+def test_sync_fetches_pages_concurrently(tmp_path, monkeypatch):
+    import threading
+    import time
+
+    setup_temp_db(tmp_path)
+    monkeypatch.setattr(curator, "SYNC_PAGE_SIZE", 2)
+    monkeypatch.setattr(curator, "SYNC_MAX_WORKERS", 4)
+
+    totals = {"private": 7, "public": 3}
+    lock = threading.Lock()
+    active = {"now": 0, "peak": 0}
+    calls = []
+
+    def fake_page(library_type="private", page=1, items_per_page=2):
+        with lock:
+            active["now"] += 1
+            active["peak"] = max(active["peak"], active["now"])
+            calls.append((library_type, page))
+        time.sleep(0.05)
+        with lock:
+            active["now"] -= 1
+        if library_type == "public" and page == 2:
+            raise RuntimeError("boom")
+        start = (page - 1) * 2
+        items = [{"guid": f"{library_type}-{i}", "title": f"V{i}", "length": 1}
+                 for i in range(start, min(start + 2, totals[library_type]))]
+        return {"items": items, "totalItems": totals[library_type]}
+
+    monkeypatch.setattr(curator, "fetch_bunny_page", fake_page)
+
+    data = curator.run_bunny_sync(["private", "public"])
+    assert data["details"]["private"]["added"] == 7
+    assert data["details"]["public"]["added"] == 2
+    assert data["total_synced"] == 9
+    assert data["failed_pages"] == [{"library": "public", "page": 2, "error": "boom"}]
+    # 4 private pages + 2 public pages, each fetched exactly once
+    assert sorted(calls) == sorted([("private", p) for p in range(1, 5)] + [("public", 1), ("public", 2)])
+    assert 1 < active["peak"] <= 4
+
+    conn = curator.db()
+    assert conn.execute("SELECT COUNT(*) FROM videos").fetchone()[0] == 9
+    conn.close()
+
+
+def test_sync_bulk_upsert_commits_in_batches(tmp_path, monkeypatch):
+    import sqlite3
+
+    setup_temp_db(tmp_path)
+    monkeypatch.setattr(curator, "SYNC_PAGE_SIZE", 100)
+    monkeypatch.setattr(curator, "SYNC_COMMIT_ROWS", 1000)
+
+    # Existing row must be updated in place, keeping its id and created_at
+    existing_id = curator.sync_video_from_bunny({"guid": "private-0", "title": "Old"}, library_type="private")
+    conn = curator.db()
+    created_at = conn.execute("SELECT created_at FROM videos WHERE id = ?", (existing_id,)).fetchone()[0]
+    conn.close()
+
+    def fake_page(library_type="private", page=1, items_per_page=100):
+        if library_type == "public":
+            return {"items": [], "totalItems": 0}
+        items = [{"guid": f"private-{i}", "title": f"V{i}", "length": i}
+                 for i in range((page - 1) * 100, page * 100)]
+        return {"items": items, "totalItems": 5000}
+
+    commits = []
+
+    class CountingConnection(sqlite3.Connection):
+        def commit(self):
+            commits.append(1)
+            super().commit()
+
+    def counting_db():
+        conn = sqlite3.connect(curator.DB_PATH, factory=CountingConnection, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    monkeypatch.setattr(curator, "fetch_bunny_page", fake_page)
+    monkeypatch.setattr(curator, "db", counting_db)
+
+    result = curator.run_bunny_sync(["private", "public"])
+    assert result["details"]["private"] == {"added": 4999, "updated": 1, "unchanged": 0, "removed": 0}
+    assert len(commits) == 5
+
+    conn = curator.db()
+    assert conn.execute("SELECT COUNT(*) FROM videos").fetchone()[0] == 5000
+    row = conn.execute("SELECT id, title, created_at FROM videos WHERE bunny_video_id = 'private-0'").fetchone()
+    conn.close()
+    assert (row["id"], row["title"], row["created_at"]) == (existing_id, "V0", created_at)
+
+
+def test_sync_skips_unchanged_and_tombstones_removed(tmp_path, monkeypatch):
+    setup_temp_db(tmp_path)
+    monkeypatch.setattr(curator, "SYNC_PAGE_SIZE", 10)
+
+    library = {"private": [{"guid": f"v{i}", "title": f"V{i}", "views": 0} for i in range(4)],
+               "public": []}
+
+    def fake_page(library_type="private", page=1, items_per_page=10):
+        items = library[library_type]
+        return {"items": items, "totalItems": len(items)}
+
+    monkeypatch.setattr(curator, "fetch_bunny_page", fake_page)
+
+    first = curator.run_bunny_sync(["private", "public"])
+    assert (first["added"], first["updated"], first["unchanged"], first["removed"]) == (4, 0, 0, 0)
+
+    # Only view counters move: nothing is rewritten
+    conn = curator.db()
+    before = conn.execute("SELECT bunny_video_id, updated_at FROM videos ORDER BY id").fetchall()
+    conn.close()
+    for video in library["private"]:
+        video["views"] += 10
+    second = curator.run_bunny_sync(["private", "public"])
+    assert (second["added"], second["updated"], second["unchanged"], second["removed"]) == (0, 0, 4, 0)
+    conn = curator.db()
+    after = conn.execute("SELECT bunny_video_id, updated_at FROM videos ORDER BY id").fetchall()
+    conn.close()
+    assert [tuple(r) for r in before] == [tuple(r) for r in after]
+
+    # One retitled, one deleted on Bunny, one new
+    library["private"][0]["title"] = "Renamed"
+    gone = library["private"].pop(1)
+    library["private"].append({"guid": "v9", "title": "V9"})
+    third = curator.run_bunny_sync(["private", "public"])
+    assert (third["added"], third["updated"], third["unchanged"], third["removed"]) == (1, 1, 2, 1)
+
+    conn = curator.db()
+    row = conn.execute("SELECT id, status, deleted_at FROM videos WHERE bunny_video_id = 'v1'").fetchone()
+    conn.close()
+    assert row["status"] == "deleted" and row["deleted_at"]
+    client = TestClient(curator.app)
+    assert client.get(f"/videos/{row['id']}").status_code == 404
+    assert "v1" not in [v["bunny_video_id"] for v in client.get("/videos").json()]
+
+    # A failed page disables removal detection for that library
+    def failing_page(library_type="private", page=1, items_per_page=10):
+        raise RuntimeError("bunny down")
+
+    monkeypatch.setattr(curator, "fetch_bunny_page", failing_page)
+    assert curator.run_bunny_sync(["private"])["removed"] == 0
+
+    # Reappearing video is restored
+    monkeypatch.setattr(curator, "fetch_bunny_page", fake_page)
+    library["private"].append(gone)
+    fourth = curator.run_bunny_sync(["private", "public"])
+    assert (fourth["updated"], fourth["removed"]) == (1, 0)
+    assert client.get(f"/videos/{row['id']}").status_code == 200
+
+
+def wait_for_sync(client, sync_id, timeout=5):
+    import time
+
+    deadline = time.time() + timeout
+    while True:
+        status = client.get(f"/sync/{sync_id}").json()
+        if status["status"] != "running" or time.time() > deadline:
+            return status
+        time.sleep(0.02)
+
+
+def test_sync_runs_as_background_job(tmp_path, monkeypatch):
+    import threading
+    import time
+
+    setup_temp_db(tmp_path)
+    monkeypatch.setattr(curator, "SYNC_PAGE_SIZE", 2)
+    release = threading.Event()
+
+    def fake_page(library_type="private", page=1, items_per_page=2):
+        release.wait(5)
+        if library_type == "public":
+            return {"items": [], "totalItems": 0}
+        if page == 3:
+            raise RuntimeError("bunny 500")
+        items = [{"guid": f"g{page}-{i}", "title": "T"} for i in range(2)]
+        return {"items": items, "totalItems": 6}
+
+    monkeypatch.setattr(curator, "fetch_bunny_page", fake_page)
+    client = TestClient(curator.app)
+
+    r = client.post("/sync/bunny")
+    assert r.status_code == 202
+    job = r.json()
+    assert job["status"] == "running" and job["coalesced"] is False
+
+    # Duplicate or narrower requests join the running sync
+    again = client.post("/sync/bunny", params={"library_type": "private"}).json()
+    assert again["sync_id"] == job["sync_id"] and again["coalesced"] is True
+    assert client.get(job["status_url"]).json()["status"] == "running"
+
+    release.set()
+    status = wait_for_sync(client, job["sync_id"])
+
+    assert status["status"] == "done"
+    assert (status["pages_total"], status["pages_done"]) == (4, 4)
+    assert status["videos"] == 4
+    assert status["errors"] == [{"library": "private", "page": 3, "error": "bunny 500"}]
+    assert status["result"]["added"] == 4
+    assert status["finished_at"] and status["videos_per_sec"] > 0
+    assert not any(k.startswith("_") for k in status)
+
+    # A finished job is not joined
+    second = client.post("/sync/bunny").json()["sync_id"]
+    assert second != job["sync_id"]
+    assert wait_for_sync(client, second)["result"]["unchanged"] == 4
+    assert client.get("/sync/unknown").status_code == 404
+
+
+def test_list_videos_filters_by_category_tag_series(tmp_path):
+    setup_temp_db(tmp_path)
+    ids = [curator.sync_video_from_bunny({"guid": f"f{i}", "title": f"V{i}"}) for i in range(5)]
+    conn = curator.db()
+    conn.execute("INSERT INTO categories (id, name, slug) VALUES (1, 'Drama', 'drama'), (2, 'Comedy', 'comedy')")
+    conn.execute("INSERT INTO tags (id, name, slug) VALUES (7, 'Live', 'live')")
+    conn.execute("INSERT INTO series (id, name, slug) VALUES (3, 'Season One', 'season-one')")
+    conn.executemany("INSERT INTO video_categories (video_id, category_id) VALUES (?, ?)",
+                     [(ids[0], 1), (ids[1], 1), (ids[2], 2), (ids[3], 1)])
+    conn.executemany("INSERT INTO video_tags (video_id, tag_id) VALUES (?, ?)", [(ids[1], 7), (ids[2], 7)])
+    conn.executemany("INSERT INTO video_series (video_id, series_id, episode_number) VALUES (?, ?, ?)",
+                     [(ids[1], 3, 1), (ids[4], 3, 2)])
+    conn.execute("UPDATE videos SET status = 'deleted' WHERE id = ?", (ids[3],))
+    conn.commit()
+    conn.close()
+
+    client = TestClient(curator.app)
+
+    def listed(**params):
+        return sorted(v["id"] for v in client.get("/videos", params=params).json())
+
+    assert listed(category=1) == [ids[0], ids[1]]
+    assert listed(category="drama") == listed(category="Drama") == [ids[0], ids[1]]
+    # public_interface sends category_id / tag_id
+    assert listed(category_id=1) == [ids[0], ids[1]]
+    assert listed(tag_id=7) == [ids[1], ids[2]]
+    assert listed(series="season-one") == [ids[1], ids[4]]
+    assert listed(category_id=1, tag="live", series_id=3) == [ids[1]]
+    assert listed(category="unknown") == []
+    assert listed() == sorted(set(ids) - {ids[3]})
+
+
+def test_list_videos_filter_uses_reverse_covering_index(tmp_path):
+    setup_temp_db(tmp_path)
+    conn = curator.db()
+    link, condition, params = curator.taxonomy_filter("tag", 7)
+    plan = " | ".join(row[3] for row in conn.execute(
+        f"EXPLAIN QUERY PLAN SELECT videos.* FROM {link} AS f CROSS JOIN videos ON videos.id = f.video_id "
+        f"WHERE f.{condition} AND videos.status = 'active'", params))
+    conn.close()
+    assert "COVERING INDEX idx_video_tags_tag" in plan
+    assert "INTEGER PRIMARY KEY" in plan
+
+
+def test_sync_skips_tombstones_when_listing_shifts_mid_sync(tmp_path, monkeypatch):
+    setup_temp_db(tmp_path)
+    monkeypatch.setattr(curator, "SYNC_PAGE_SIZE", 2)
+    library = [{"guid": f"v{i}", "title": f"V{i}"} for i in range(4)]
+    shift = {"armed": False}
+
+    def fake_page(library_type="private", page=1, items_per_page=2):
+        if library_type == "public":
+            return {"items": [], "totalItems": 0}
+        if page == 2 and shift["armed"]:
+            # v0 deleted on Bunny after page 1 was read: v2 slides onto page 1
+            shift["armed"] = False
+            del library[0]
+        start = (page - 1) * items_per_page
+        return {"items": library[start:start + items_per_page], "totalItems": len(library)}
+
+    monkeypatch.setattr(curator, "fetch_bunny_page", fake_page)
+    assert curator.run_bunny_sync(["private", "public"])["added"] == 4
+
+    shift["armed"] = True
+    result = curator.run_bunny_sync(["private", "public"])
+    assert result["removed"] == 0
+    conn = curator.db()
+    statuses = dict(conn.execute("SELECT bunny_video_id, status FROM videos").fetchall())
+    conn.close()
+    assert statuses == {"v0": "active", "v1": "active", "v2": "active", "v3": "active"}
+
+    # Listing stable again: the real deletion is picked up
+    result = curator.run_bunny_sync(["private", "public"])
+    assert (result["removed"], result["unchanged"]) == (1, 3)
+    conn = curator.db()
+    assert conn.execute("SELECT status FROM videos WHERE bunny_video_id = 'v0'").fetchone()[0] == "deleted"
+    assert conn.execute("SELECT COUNT(*) FROM videos WHERE status = 'active'").fetchone()[0] == 3
+    conn.close()
@@ -0,0 +1,1090 @@
+import asyncio
+import json
+import threading
+import time
+import hashlib
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from fastapi.testclient import TestClient
+
+import gateway.gateway as gateway
+
+
+def setup_temp_db(tmp_path):
+    dbfile = tmp_path / "gateway_test.db"
+    gateway.DB_PATH = str(dbfile)
+    gateway.init_db()
+    return str(dbfile)
+
+
+def wait_for_status(job_id, status, timeout=3):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = gateway.get_job(job_id)
+        if job.get("status") == status:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} never reached {status}: {gateway.get_job(job_id)}")
+
+
+def test_claim_next_marks_job_running(tmp_path):
+    setup_temp_db(tmp_path)
+    job_id = gateway.insert_job("/videos/a.mp4")
+
+    job = gateway.claim_next()
+    assert job["id"] == job_id
+    assert job["status"] == "narrating"
+    assert job["claim_token"]
+
+    # Nothing left to claim
+    assert gateway.claim_next() is None
+
+
+def test_concurrent_workers_never_claim_same_job(tmp_path):
+    setup_temp_db(tmp_path)
+    job_ids = {gateway.insert_job(f"/videos/{i}.mp4") for i in range(40)}
+
+    claimed = []
+    lock = threading.Lock()
+
+    def drain():
+        while True:
+            job = gateway.claim_next()
+            if job is None:
+                return
+            with lock:
+                claimed.append(job["id"])
+
+    threads = [threading.Thread(target=drain) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(claimed) == len(set(claimed))
+    assert set(claimed) == job_ids
+
+
+def test_insert_wakes_idle_worker_immediately(tmp_path, monkeypatch):
+    setup_temp_db(tmp_path)
+    # Long polling interval: only the wakeup can get the job started quickly
+    monkeypatch.setattr(gateway, "WORKER_INTERVAL", 30)
+
+    started = {}
+    done = threading.Event()
+
+    def fake_narrator(file_path):
+        started[file_path] = time.monotonic()
+        if len(started) == 3:
+            done.set()
+        return {}
+
+    monkeypatch.setattr(gateway, "call_narrator", fake_narrator)
+    gateway.start_workers({"narrator": 1, "builder": 0, "publisher": 0})
+    try:
+        time.sleep(0.1)  # let the worker go idle
+        enqueued = time.monotonic()
+        files = [f"/videos/{i}.mp4" for i in range(3)]
+        for f in files:
+            gateway.insert_job(f)
+        assert done.wait(2)
+    finally:
+        gateway.stop_workers()
+
+    assert started[files[0]] - enqueued < 0.05
+    # Queued jobs are drained back-to-back, without a polling gap
+    assert started[files[-1]] - enqueued < 0.5
+
+
+def test_pipeline_overlaps_narration_with_build(tmp_path, monkeypatch):
+    setup_temp_db(tmp_path)
+    monkeypatch.setattr(gateway, "WORKER_INTERVAL", 30)
+
+    timeline = []
+    published = []
+    all_published = threading.Event()
+
+    def fake_narrator(file_path):
+        timeline.append(("narrated", file_path))
+        return {"title": file_path}
+
+    def fake_builder(meta):
+        time.sleep(0.2)
+        timeline.append(("built", meta["title"]))
+        return {"post_id": 7, "link": "https://example.com/p"}
+
+    def fake_deliver(kind, payload):
+        if kind == "notify":
+            published.append((payload["title"], payload["link"]))
+        if len(published) == 2:
+            all_published.set()
+
+    monkeypatch.setattr(gateway, "call_narrator", fake_narrator)
+    monkeypatch.setattr(gateway, "call_builder", fake_builder)
+    monkeypatch.setattr(gateway, "deliver_message", fake_deliver)
+    gateway.start_workers({"narrator": 1, "builder": 1, "publisher": 1})
+    try:
+        first = gateway.insert_job("/videos/a.mp4")
+        gateway.insert_job("/videos/b.mp4")
+        assert all_published.wait(3)
+        job = wait_for_status(first, "done")
+    finally:
+        gateway.stop_workers()
+
+    # Job B is narrated while job A is still being built
+    assert timeline.index(("narrated", "/videos/b.mp4")) < timeline.index(("built", "/videos/a.mp4"))
+    assert job["post_id"] == 7
+    assert ("/videos/a.mp4", "https://example.com/p") in published
+
+
+def outbox_rows(job_id):
+    with gateway.db() as c:
+        return [dict(r) for r in c.execute(
+            "SELECT * FROM outbox WHERE job_id = ? ORDER BY id", (job_id,)
+        )]
+
+
+def test_done_transition_writes_outbox_in_same_transaction(tmp_path, monkeypatch):
+    setup_temp_db(tmp_path)
+    monkeypatch.setattr(gateway, "call_builder", lambda meta: {"post_id": 3, "link": "https://x/p"})
+    job_id = gateway.insert_job("/videos/a.mp4")
+    gateway.set_status(job_id, "narrated", narrator_json='{"title": "A"}')
+
+    gateway.process_job("builder", gateway.claim_next("builder"))
+
+    assert gateway.get_job(job_id)["status"] == "done"
+    rows = outbox_rows(job_id)
+    assert [r["kind"] for r in rows] == ["notify", "social"]
+    assert all(r["status"] == "pending" for r in rows)
+    assert json.loads(rows[0]["payload"]) == {"title": "A", "link": "https://x/p"}
+
+
+def test_outbox_retries_failures_with_backoff_then_gives_up(tmp_path, monkeypatch):
+    setup_temp_db(tmp_path)
+    monkeypatch.setattr(gateway, "OUTBOX_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(gateway, "OUTBOX_RETRY_BASE_SEC", 0)
+
+    def fake_deliver(kind, payload):
+        if kind == "social":
+            raise RuntimeError("publisher asleep")
+
+    monkeypatch.setattr(gateway, "deliver_message", fake_deliver)
+    with gateway.db() as c:
+        gateway.enqueue_notifications(c, {"id": 1, "narrator_json": None}, "https://x/p")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        gateway.deliver_outbox_batch(gateway.claim_outbox_batch(), pool)
+        notify, social = outbox_rows(1)
+        assert notify["status"] == "sent"
+        assert social["status"] == "pending"
+        assert social["last_error"] == "publisher asleep"
+
+        gateway.deliver_outbox_batch(gateway.claim_outbox_batch(), pool)
+        assert outbox_rows(1)[1]["status"] == "dead"
+        assert gateway.claim_outbox_batch() == []
+
+
+def test_failed_stage_is_rescheduled_without_blocking_other_jobs(tmp_path, monkeypatch):
+    setup_temp_db(tmp_path)
+    monkeypatch.setattr(gateway, "JOB_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(gateway, "backoff_delay", lambda attempt, base, cap: 60)
+
+    def fake_narrator(file_path):
+        if file_path == "/videos/bad.mp4":
+            raise RuntimeError("narrator down")
+        return {"title": file_path}
+
+    monkeypatch.setattr(gateway, "call_narrator", fake_narrator)
+    bad = gateway.insert_job("/videos/bad.mp4")
+    good = gateway.insert_job("/videos/good.mp4")
+
+    job = gateway.claim_next("narrator")
+    assert job["id"] == bad
+    gateway.fail_job("narrator", job, "narrator down")
+    retry = gateway.get_job(bad)
+    assert retry["status"] == "queued"
+    assert retry["attempts"] == 1
+    assert retry["next_attempt_at"] > time.time() + 50
+
+    # The failed job is not due yet: the next claim takes the other job
+    job = gateway.claim_next("narrator")
+    assert job["id"] == good
+    gateway.process_job("narrator", job)
+    assert gateway.get_job(good)["status"] == "narrated"
+    assert gateway.claim_next("narrator") is None
+
+    gateway.set_status(bad, "queued", next_attempt_at=0)
+    job = gateway.claim_next("narrator")
+    assert job["id"] == bad
+    gateway.fail_job("narrator", job, "narrator down")
+    failed = gateway.get_job(bad)
+    assert failed["status"] == "error"
+    assert failed["last_error"] == "narrator: narrator down"
+
+
+def claim_subselect_plan(sql, params):
+    """Plan de la sous-requête de sélection du UPDATE de claim réellement exécuté"""
+    sub = sql[sql.index("(SELECT") + 1:sql.index("LIMIT 1)") + len("LIMIT 1")]
+    with gateway.db() as c:
+        return " | ".join(r["detail"] for r in c.execute("EXPLAIN QUERY PLAN " + sub, params))
+
+
+def test_claim_query_uses_due_index(tmp_path):
+    setup_temp_db(tmp_path)
+    t = time.time()
+    # Claim dans une lane : statut, lane, priorité et échéance bornés par l'index
+    plan = claim_subselect_plan(gateway._CLAIM_LANE_SQL, ("queued", "default", 0, t))
+    assert "idx_jobs_lane (status=? AND lane=? AND priority=? AND next_attempt_at<?)" in plan
+    assert "TEMP B-TREE" not in plan
+    plan = claim_subselect_plan(gateway._CLAIM_ANY_SQL, ("queued", t))
+    assert "idx_jobs_due (status=? AND next_attempt_at<?)" in plan
+    with gateway.db() as c:
+        plan = " | ".join(r["detail"] for r in c.execute(
+            "EXPLAIN QUERY PLAN " + gateway._NEXT_PRIORITY_SQL, ("queued", "default", 5)))
+        assert "idx_jobs_lane (status=? AND lane=? AND priority<?)" in plan
+        assert "TEMP B-TREE" not in plan
+        plan = " | ".join(r["detail"] for r in c.execute(
+            "EXPLAIN QUERY PLAN SELECT 1 FROM jobs WHERE status = ? AND lane = ? AND next_attempt_at <= ? LIMIT 1",
+            ("queued", "default", t)))
+        assert "idx_jobs_lane_due (status=? AND lane=? AND next_attempt_at<?)" in plan
+
+
+def test_claim_skips_backed_off_higher_priority_jobs(tmp_path):
+    setup_temp_db(tmp_path)
+    backed_off = gateway.insert_job("/videos/urgent.mp4", priority=9)
+    gateway.set_status(backed_off, "queued", next_attempt_at=time.time() + 3600)
+    low = gateway.insert_job("/videos/low.mp4", priority=1)
+    mid = gateway.insert_job("/videos/mid.mp4", priority=5)
+
+    assert gateway.claim_next("narrator")["id"] == mid
+    assert gateway.claim_next("narrator")["id"] == low
+    assert gateway.claim_next("narrator") is None
+
+
+def test_reaper_requeues_expired_lease_and_fences_stale_worker(tmp_path, monkeypatch):
+    setup_temp_db(tmp_path)
+    monkeypatch.setattr(gateway, "call_narrator", lambda file_path: {"title": "A"})
+    job_id = gateway.insert_job("/videos/a.mp4")
+    stale = gateway.claim_next("narrator")
+    assert stale["lease_expires_at"] > time.time()
+
+    # Live lease: nothing to reap
+    assert gateway.reap_expired_leases() == 0
+
+    # The worker died: its lease expires and the job goes back to the queue
+    gateway.set_status(job_id, "narrating", lease_expires_at=time.time() - 1)
+    assert gateway.reap_expired_leases() == 1
+    job = gateway.get_job(job_id)
+    assert job["status"] == "queued"
+    assert job["attempts"] == 1
+    assert job["last_error"] == "narrator: lease expired"
+
+    fresh = gateway.claim_next("narrator")
+    assert fresh["id"] == job_id
+
+    # The stale worker finishing late cannot overwrite the new owner's claim
+    gateway.process_job("narrator", stale)
+    assert gateway.get_job(job_id)["status"] == "narrating"
+    gateway.process_job("narrator", fresh)
+    assert gateway.get_job(job_id)["status"] == "narrated"
+
+
+def test_heartbeat_renews_held_leases(tmp_path):
+    setup_temp_db(tmp_path)
+    job_id = gateway.insert_job("/videos/a.mp4")
+    job = gateway.claim_next("narrator")
+    gateway.set_status(job_id, "narrating", lease_expires_at=time.time() + 0.5)
+
+    with gateway.hold_lease(job):
+        assert gateway.renew_leases() == 1
+    assert gateway.renew_leases() == 0
+
+    renewed = gateway.get_job(job_id)
+    assert renewed["lease_expires_at"] > time.time() + gateway.JOB_LEASE_SEC - 5
+    assert gateway.reap_expired_leases() == 0
+
+
+def test_events_batch_inserts_in_order_and_honors_idempotency_keys(tmp_path, monkeypatch):
+    setup_temp_db(tmp_path)
+    monkeypatch.setattr(gateway, "_sources", {})
+    client = TestClient(gateway.app)
+
+    events = [{"event": "backfill", "file": f"/videos/{i}.mp4", "idempotency_key": f"k{i}"} for i in range(300)]
+    events.append({"event": "backfill", "file": "/videos/nokey.mp4"})
+    r = client.post("/events/batch", json={"events": events})
+    data = r.json()
+    assert data["ok"] is True
+    job_ids = data["job_ids"]
+    assert len(job_ids) == 301
+    assert [gateway.get_job(j)["file"] for j in job_ids[:3]] == ["/videos/0.mp4", "/videos/1.mp4", "/videos/2.mp4"]
+    assert gateway.get_job(job_ids[-1])["file"] == "/videos/nokey.mp4"
+
+    # Replaying part of the batch returns the existing jobs
+    r = client.post("/events/batch", json=[events[5], {"event": "backfill", "file": "/videos/new.mp4"}])
+    replay = r.json()["job_ids"]
+    assert replay[0] == job_ids[5]
+    assert replay[1] not in job_ids
+
+
+def test_events_batch_rejects_invalid_event(tmp_path):
+    setup_temp_db(tmp_path)
+    client = TestClient(gateway.app)
+    r = client.post("/events/batch", json={"events": [{"event": "x", "file": "/a"}, {"event": "x"}]})
+    assert r.json() == {"ok": False, "error": "Event #1: Missing required fields: 'event' and 'file' are required", "index": 1}
+    assert client.get("/jobs").json() == []
+
+
+def test_weighted_lanes_keep_manual_uploads_ahead_of_backfill_flood(tmp_path, monkeypatch):
+    setup_temp_db(tmp_path)
+    monkeypatch.setattr(gateway, "_lane_credit", {name: {} for name in gateway.STAGES})
+    gateway.insert_jobs([{"event": "backfill", "file": f"/old/{i}.mp4"} for i in range(50)])
+    manual = [
+        gateway.insert_job(f"/new/{i}.mp4", lane="manual_upload") for i in range(4)
+    ]
+
+    first = [gateway.claim_next() for _ in range(9)]
+    # Poids 8:1 — les 4 uploads manuels passent avant le 2e job de backfill
+    assert {j["id"] for j in first if j["lane"] == "manual_upload"} == set(manual)
+    assert sum(1 for j in first if j["lane"] == "backfill") == 5
+    assert [j["lane"] for j in first[:5]].count("backfill") <= 1
+
+
+def test_priority_orders_jobs_within_a_lane(tmp_path, monkeypatch):
+    setup_temp_db(tmp_path)
+    monkeypatch.setattr(gateway, "_lane_credit", {name: {} for name in gateway.STAGES})
+    low = gateway.insert_job("/videos/low.mp4")
+    high = gateway.insert_job("/videos/high.mp4", priority=5)
+
+    assert [gateway.claim_next()["id"] for _ in range(2)] == [high, low]
+
+    client = TestClient(gateway.app)
+    r = client.post("/events/batch", json={"events": [
+        {"event": "manual_upload", "file": "/videos/x.mp4", "lane": "nope"}
+    ]})
+    assert r.json()["ok"] is False
+    assert "Unknown lane" in r.json()["error"]
+
+
+def test_event_rejects_with_429_when_queue_is_full(tmp_path, monkeypatch):
+    setup_temp_db(tmp_path)
+    monkeypatch.setattr(gateway, "MAX_QUEUE_DEPTH", 3)
+    monkeypatch.setattr(gateway, "_drained", gateway.deque())
+    client = TestClient(gateway.app)
+    r = client.post("/events/batch", json=[{"event": "backfill", "file": f"/v/{i}.mp4"} for i in range(3)])
+    assert r.json()["ok"] is True
+
+    # Vidage observé : 30 jobs sur la fenêtre → Retry-After = excès / débit
+    for _ in range(30):
+        gateway.record_drained("backfill")
+    rate = gateway.drain_rate()
+    r = client.post("/event", json={"event": "new_video", "file": "/v/x.mp4"})
+    assert r.status_code == 429
+    assert int(r.headers["Retry-After"]) == gateway.retry_after(1, rate)
+    assert r.json()["ok"] is False
+
+    queue = client.get("/queue").json()
+    assert queue["depth"] == 3
+    assert queue["lanes"]["backfill"]["depth"] == 3
+    assert queue["lanes"]["manual_upload"]["depth"] == 0
+
+
+def test_insert_jobs_surfaces_constraint_errors_other_than_duplicate_keys(tmp_path):
+    setup_temp_db(tmp_path)
+    ok = gateway.JobEvent(event="upload", file="/videos/ok.mp4", idempotency_key="k-ok")
+    broken = gateway.JobEvent(event="upload", file="/videos/broken.mp4", lane=None)
+
+    # lane NOT NULL : l'erreur SQLite remonte telle quelle, le lot entier est annulé
+    with pytest.raises(sqlite3.IntegrityError, match="NOT NULL"):
+        gateway.insert_jobs([ok, broken])
+    with gateway.db() as c:
+        assert c.execute("SELECT COUNT(*) FROM jobs").fetchone()[0] == 0
+
+    first = gateway.insert_jobs([ok])
+    assert gateway.insert_jobs([ok]) == first
+
+
+def test_lane_depth_and_source_rate_limits(tmp_path, monkeypatch):
+    setup_temp_db(tmp_path)
+    monkeypatch.setattr(gateway, "LANE_MAX_DEPTH", {"backfill": 2})
+    monkeypatch.setattr(gateway, "SOURCE_BURST", 3)
+    monkeypatch.setattr(gateway, "SOURCE_RATE_PER_SEC", 0.5)
+    monkeypatch.setattr(gateway, "_sources", {})
+    client = TestClient(gateway.app)
+
+    # Plus d'événements que la réserve : jamais admissible, 413 sans Retry-After
+    backfill = [{"event": "backfill", "file": f"/v/{i}.mp4"} for i in range(4)]
+    r = client.post("/events/batch", json=backfill, headers={"X-Source": "bot-a"})
+    assert r.status_code == 413 and "exceeds the per-source burst" in r.json()["error"]
+    assert "Retry-After" not in r.headers
+
+    r = client.post("/events/batch", json=backfill[:3], headers={"X-Source": "bot-a"})
+    assert r.status_code == 429 and "Lane 'backfill' full" in r.json()["error"]
+    # Aucun débit de vidage observé : attente maximale
+    assert r.headers["Retry-After"] == str(gateway.RETRY_AFTER_MAX_SEC)
+
+    # Le refus queue_full a rendu les jetons : bot-a peut encore enfiler 2 événements
+    r = client.post("/events/batch", json=backfill[:2], headers={"X-Source": "bot-a"})
+    assert r.json()["ok"] is True
+
+    # Un jeton par événement : il n'en reste qu'un à bot-a, pas de quoi payer 2
+    default = [{"event": "upload", "file": f"/d/{i}.mp4"} for i in range(2)]
+    r = client.post("/events/batch", json=default, headers={"X-Source": "bot-a"})
+    assert r.status_code == 429 and "Rate limit" in r.json()["error"]
+    assert 1 <= int(r.headers["Retry-After"]) <= 2
+    r = client.post("/events/batch", json=default, headers={"X-Source": "bot-b"})
+    assert r.json()["ok"] is True
+    assert gateway._admission_stats["too_large"] >= 1
+
+
+def test_default_admission_accepts_a_full_batch(tmp_path, monkeypatch):
+    setup_temp_db(tmp_path)
+    monkeypatch.setattr(gateway, "_sources", {})
+    client = TestClient(gateway.app)
+    assert gateway.SOURCE_BURST >= gateway.MAX_BATCH_EVENTS
+
+    events = [{"event": "upload", "file": f"/v/{i}.mp4"} for i in range(gateway.MAX_BATCH_EVENTS)]
+    r = client.post("/events/batch", json=events, headers={"X-Source": "bulk"})
+    assert r.json()["ok"] is True
+    assert len(r.json()["job_ids"]) == gateway.MAX_BATCH_EVENTS
+
+
+def test_retry_after_scales_with_drain_rate():
+    assert gateway.retry_after(10, 0.5) == 20
+    assert gateway.retry_after(1, 100) == 1
+    assert gateway.retry_after(10, 0) == gateway.RETRY_AFTER_MAX_SEC
+
+
+def test_archive_moves_old_terminal_jobs_and_get_job_falls_back(tmp_path):
+    setup_temp_db(tmp_path)
+    old_done = gateway.insert_job("/videos/old.mp4")
+    old_error = gateway.insert_job("/videos/broken.mp4")
+    recent_done = gateway.insert_job("/videos/recent.mp4")
+    queued = gateway.insert_job("/videos/queued.mp4")
+    meta = json.dumps({"title": "Old", "description": "x" * 2000})
+    long_ago = "2020-01-01T00:00:00.000"
+    with gateway.db() as c:
+        c.execute("UPDATE jobs SET status='done', narrator_json=?, link='https://x/old', updated_at=? "
+                  "WHERE id=?", (meta, long_ago, old_done))
+        c.execute("UPDATE jobs SET status='error', updated_at=? WHERE id=?", (long_ago, old_error))
+        c.execute("UPDATE jobs SET status='done', narrator_json=? WHERE id=?", (meta, recent_done))
+        c.execute("UPDATE jobs SET updated_at=? WHERE id=?", (long_ago, queued))
+
+    assert gateway.archive_jobs(older_than_days=30, batch=1) == 2
+
+    with gateway.db() as c:
+        hot = {r["id"] for r in c.execute("SELECT id FROM jobs")}
+        blob = c.execute("SELECT data FROM jobs_archive WHERE id=?", (old_done,)).fetchone()["data"]
+    assert hot == {recent_done, queued}
+    assert len(blob) < len(meta)
+
+    job = gateway.get_job(old_done)
+    assert job["status"] == "done"
+    assert job["link"] == "https://x/old"
+    assert json.loads(job["narrator_json"])["title"] == "Old"
+    assert job["archived_at"]
+    assert gateway.get_job(recent_done)["status"] == "done"
+    assert gateway.get_job(999) == {"error": "not found"}
+
+
+def test_downstream_limiter_caps_in_flight_across_workers(monkeypatch):
+    limiter = gateway.DownstreamLimiter("builder", rps=0, max_in_flight=2)
+    monkeypatch.setitem(gateway.LIMITERS, "builder", limiter)
+    peak, lock = [0], threading.Lock()
+
+    class FakeResponse:
+        status_code = 200
+
+        def json(self):
+            return {"post_id": 1}
+
+    def fake_post(url, json=None, timeout=None):
+        with lock:
+            peak[0] = max(peak[0], limiter.in_flight)
+        time.sleep(0.02)
+        return FakeResponse()
+
+    monkeypatch.setattr(gateway.SESSIONS["builder"], "post", fake_post)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: gateway.call_builder({}), range(16)))
+
+    assert all(r == {"post_id": 1} for r in results)
+    assert peak[0] == 2
+    assert limiter.in_flight == 0
+
+
+def test_downstream_calls_reuse_pooled_session_with_stage_timeouts(monkeypatch):
+    calls = []
+
+    class FakeResponse:
+        status_code = 200
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"title": "A"}
+
+    def fake_post(url, json=None, timeout=None):
+        calls.append((url, timeout))
+        return FakeResponse()
+
+    monkeypatch.setattr(gateway.SESSIONS["narrator"], "post", fake_post)
+    monkeypatch.setattr(gateway.SESSIONS["publisher"], "post", fake_post)
+    gateway.call_narrator("/videos/a.mp4")
+    gateway.call_narrator("/videos/b.mp4")
+    gateway.deliver_message("social", {"title": "A"})
+
+    narrator_timeout = (gateway.NARRATOR_CONNECT_TIMEOUT_SEC, gateway.NARRATOR_READ_TIMEOUT_SEC)
+    assert calls[:2] == [(gateway.NARRATOR_URL, narrator_timeout)] * 2
+    assert calls[2] == (gateway.PUBLISHER_SOCIAL_URL, (gateway.PUBLISHER_CONNECT_TIMEOUT_SEC,
+                                                       gateway.PUBLISHER_SOCIAL_READ_TIMEOUT_SEC))
+    adapter = gateway.SESSIONS["builder"].get_adapter("https://example.com")
+    assert adapter._pool_maxsize == gateway.LIMITERS["builder"].max_in_flight
+
+
+def test_downstream_limiter_rate_and_wait_metric():
+    limiter = gateway.DownstreamLimiter("ratetest", rps=20, max_in_flight=10)
+    started = time.monotonic()
+    for _ in range(23):
+        with limiter.acquire():
+            pass
+    # Une seconde de réserve (20 jetons) puis 1 jeton toutes les 50 ms
+    assert time.monotonic() - started >= 0.14
+    metrics = "\n".join(gateway.LIMITER_WAIT.render())
+    assert 'gateway_downstream_limiter_wait_seconds_count{downstream="ratetest"} 23' in metrics
+
+
+def serve_bytes(payload, ranges=True):
+    """Serveur HTTP local qui sert `payload` (avec ou sans support Range)"""
+    seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, body_wanted):
+            header = self.headers.get("Range") if ranges else None
+            seen.append(header)
+            if header:
+                start, end = (int(x) for x in header.split("=")[1].split("-"))
+                body, status = payload[start:end + 1], 206
+            else:
+                body, status = payload, 200
+            self.send_response(status)
+            self.send_header("Content-Length", str(len(body)))
+            if ranges:
+                self.send_header("Accept-Ranges", "bytes")
+            self.end_headers()
+            if body_wanted:
+                self.wfile.write(body)
+
+        def do_HEAD(self):
+            self._send(False)
+
+        def do_GET(self):
+            self._send(True)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/clip.mp4", seen
+
+
+def tree_checksum(payload, chunk):
+    digests = b"".join(hashlib.sha256(payload[i:i + chunk]).digest() for i in range(0, len(payload), chunk))
+    return hashlib.sha256(digests).hexdigest()
+
+
+def test_download_uses_parallel_ranges_and_matches_streamed_checksum(tmp_path, monkeypatch):
+    setup_temp_db(tmp_path)
+    monkeypatch.setattr(gateway, "DOWNLOAD_DIR", str(tmp_path / "scratch"))
+    monkeypatch.setattr(gateway, "DOWNLOAD_CHUNK_BYTES", 64 * 1024)
+    payload = os.urandom(300 * 1024)
+    expected = tree_checksum(payload, 64 * 1024)
+
+    server, url, seen = serve_bytes(payload)
+    try:
+        result = gateway.download(url)
+    finally:
+        server.shutdown()
+    assert open(result["local_path"], "rb").read() == payload
+    assert result["local_path"].endswith(".mp4")
+    assert result["checksum"] == expected
+    assert sum(1 for r in seen if r) == 5  # 5 blocs de 64 Ko en Range
+
+    # Serveur sans Range : flux unique, même checksum
+    os.remove(result["local_path"])
+    server, url, seen = serve_bytes(payload, ranges=False)
+    try:
+        result = gateway.download(url)
+    finally:
+        server.shutdown()
+    assert result["checksum"] == expected
+    assert not any(seen)
+
+
+def test_remote_job_goes_through_download_stage_before_narrator(tmp_path, monkeypatch):
+    setup_temp_db(tmp_path)
+    monkeypatch.setattr(gateway, "DOWNLOAD_DIR", str(tmp_path / "scratch"))
+    payload = os.urandom(4096)
+    seen_paths = []
+
+    def fake_narrator(path):
+        seen_paths.append(path)
+        return {"title": "Remote"}
+
+    monkeypatch.setattr(gateway, "call_narrator", fake_narrator)
+    server, url, _ = serve_bytes(payload)
+    try:
+        job_id = gateway.insert_job(url)
+        assert gateway.get_job(job_id)["status"] == "download_queued"
+        assert gateway.claim_next("narrator") is None
+
+        job = gateway.claim_next("downloader")
+        gateway.process_job("downloader", job)
+    finally:
+        server.shutdown()
+
+    job = gateway.get_job(job_id)
+    assert job["status"] == "queued"
+    assert job["file"] == url
+    assert job["source_size"] == 4096
+    gateway.process_job("narrator", gateway.claim_next("narrator"))
+    assert seen_paths == [job["local_path"]]
+    assert gateway.get_job(job_id)["status"] == "narrated"
+
+
+def test_scratch_lru_evicts_oldest_files_not_in_use(tmp_path, monkeypatch):
+    setup_temp_db(tmp_path)
+    scratch = tmp_path / "scratch"
+    scratch.mkdir()
+    monkeypatch.setattr(gateway, "DOWNLOAD_DIR", str(scratch))
+    paths = []
+    for i in range(4):
+        path = scratch / f"f{i}.mp4"
+        path.write_bytes(b"x" * 1000)
+        os.utime(path, (1000 + i, 1000 + i))
+        paths.append(str(path))
+    # f0 (le plus ancien) appartient à un job encore en file
+    job_id = gateway.insert_job("https://cdn.example/f0.mp4")
+    gateway.set_status(job_id, "queued", local_path=paths[0])
+
+    assert gateway.prune_scratch(max_bytes=2000) == 2
+    assert [os.path.exists(p) for p in paths] == [True, False, False, True]
+
+
+def test_scratch_lru_keeps_the_file_just_downloaded(tmp_path, monkeypatch):
+    setup_temp_db(tmp_path)
+    scratch = tmp_path / "scratch"
+    scratch.mkdir()
+    monkeypatch.setattr(gateway, "DOWNLOAD_DIR", str(scratch))
+    monkeypatch.setattr(gateway, "SCRATCH_MAX_BYTES", 4000)
+    busy = scratch / "busy.mp4"
+    busy.write_bytes(b"x" * 2000)
+    job_id = gateway.insert_job("https://cdn.example/busy.mp4")
+    gateway.set_status(job_id, "queued", local_path=str(busy))
+
+    # 2000 (en cours) + 3000 (nouveau) > 4000 : aucun des deux n'est évictable
+    payload = os.urandom(3000)
+    server, url, _ = serve_bytes(payload)
+    try:
+        result = gateway.download(url)
+    finally:
+        server.shutdown()
+    assert result["source_size"] == 3000
+    assert open(result["local_path"], "rb").read() == payload
+    assert busy.exists()
+
+
+def test_event_endpoints_do_sqlite_work_off_the_event_loop(tmp_path, monkeypatch):
+    setup_temp_db(tmp_path)
+    on_loop = []
+
+    def running_on_loop():
+        try:
+            asyncio.get_running_loop()
+            return True
+        except RuntimeError:
+            return False
+
+    real_admit, real_insert = gateway.admit, gateway.insert_jobs
+    monkeypatch.setattr(gateway, "admit", lambda *a: on_loop.append(running_on_loop()) or real_admit(*a))
+    monkeypatch.setattr(gateway, "insert_jobs", lambda *a: on_loop.append(running_on_loop()) or real_insert(*a))
+
+    client = TestClient(gateway.app)
+    assert client.post("/event", json={"event": "new_video", "file": "/v/a.mp4"}).json()["ok"] is True
+    assert client.post("/events/batch", json=[{"event": "new_video", "file": "/v/b.mp4"}]).json()["ok"] is True
+    assert on_loop == [False] * 4
+
+
+def test_event_endpoint_creates_typed_integer_job(tmp_path):
+    setup_temp_db(tmp_path)
+    client = TestClient(gateway.app)
+    r = client.post("/event", json={
+        "event": "manual_upload", "file": "/videos/a.mp4", "title": "Scene 1",
+        "timestamp": "2025-11-12T01:23:45Z"
+    })
+    body = r.json()
+    assert body["ok"] is True and isinstance(body["job_id"], int)
+
+    job = gateway.get_job(body["job_id"])
+    assert (job["event"], job["title"], job["event_ts"]) == ("manual_upload", "Scene 1", "2025-11-12T01:23:45Z")
+    assert job["lane"] == "manual_upload" and job["status"] == "queued"
+    assert gateway.claim_next()["id"] == body["job_id"]
+
+    r = client.post("/event", json={"event": "manual_upload", "file": "https://cdn.example/v.mp4"})
+    assert gateway.get_job(r.json()["job_id"])["status"] == "download_queued"
+    r = client.post("/event", json={"event": "new_video"})
+    assert r.json() == {"ok": False, "error": "Missing required fields: 'event' and 'file' are required"}
+
+
+def test_init_db_migrates_legacy_schema_once(tmp_path):
+    import sqlite3
+
+    dbfile = tmp_path / "legacy.db"
+    legacy = sqlite3.connect(dbfile)
+    legacy.execute("""
+        CREATE TABLE jobs(id INTEGER PRIMARY KEY AUTOINCREMENT, file TEXT NOT NULL,
+                          status TEXT NOT NULL DEFAULT 'queued', narrator_json TEXT, post_id INTEGER,
+                          link TEXT, last_error TEXT, created_at TEXT NOT NULL, updated_at TEXT NOT NULL)
+    """)
+    legacy.execute("INSERT INTO jobs(file, status, created_at, updated_at) VALUES('/v/a.mp4', 'running', 'x', 'x')")
+    legacy.commit()
+    legacy.close()
+
+    gateway.DB_PATH = str(dbfile)
+    gateway.init_db()
+    with gateway.db() as c:
+        assert c.execute("PRAGMA user_version").fetchone()[0] == gateway.SCHEMA_VERSION
+        cols = {r["name"] for r in c.execute("PRAGMA table_info(jobs)")}
+        assert {"lane", "title", "event", "local_path", "next_attempt_at"} <= cols
+    assert gateway.get_job(1)["status"] == "queued"
+
+    gateway.set_status(1, "running")
+    gateway.init_db()  # déjà à jour : les migrations ne sont pas rejouées
+    assert gateway.get_job(1)["status"] == "running"
+
+
+def test_requeue_creates_new_job_through_insert_path(tmp_path):
+    setup_temp_db(tmp_path)
+    client = TestClient(gateway.app)
+    job_id = gateway.insert_job("/videos/a.mp4", lane="resync", priority=3, title="A")
+    assert client.post(f"/jobs/{job_id}/requeue").json()["ok"] is False
+
+    gateway.set_status(job_id, "error", last_error="boom")
+    r = client.post(f"/jobs/{job_id}/requeue").json()
+    assert r["ok"] is True and r["requeued_from"] == job_id
+    new = gateway.get_job(r["job_id"])
+    assert (new["file"], new["lane"], new["priority"], new["title"]) == ("/videos/a.mp4", "resync", 3, "A")
+    assert (new["status"], new["event"]) == ("queued", "requeue")
+    assert client.post("/jobs/999/requeue").json() == {"ok": False, "error": "not found"}
+
+
+def test_narrator_cache_skips_duplicate_content(tmp_path, monkeypatch):
+    setup_temp_db(tmp_path)
+    calls = []
+
+    def fake_narrator(file_path):
+        calls.append(file_path)
+        return {"title": "Scene 1", "file": file_path}
+
+    monkeypatch.setattr(gateway, "call_narrator", fake_narrator)
+    monkeypatch.setattr(gateway, "_cache_stats", {"hits": 0, "misses": 0, "bypassed": 0})
+    original = tmp_path / "scene1.mov"
+    original.write_bytes(b"frame" * 10000)
+    reupload = tmp_path / "scene1-copy.mov"
+    reupload.write_bytes(b"frame" * 10000)
+
+    first = gateway.insert_job(str(original))
+    second = gateway.insert_job(str(reupload))
+    for _ in range(2):
+        gateway.process_job("narrator", gateway.claim_next("narrator"))
+
+    assert calls == [str(original)]
+    first_meta = json.loads(gateway.get_job(first)["narrator_json"])
+    second_meta = json.loads(gateway.get_job(second)["narrator_json"])
+    assert second_meta == {**first_meta, "file": str(reupload)}
+    assert first_meta["file"] == str(original)
+    assert gateway.get_job(second)["fingerprint"] == gateway.fingerprint(str(original))
+
+    stats = TestClient(gateway.app).get("/cache/stats").json()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["entries"] == 1
+
+
+def test_fingerprint_ignores_remote_inputs(tmp_path):
+    assert gateway.fingerprint("https://example.com/video.mp4") is None
+    assert gateway.fingerprint(str(tmp_path)) is None
+
+
+def test_db_reuses_one_wal_connection_per_thread(tmp_path):
+    setup_temp_db(tmp_path)
+    conn = gateway.db()
+    assert gateway.db() is conn
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+
+    other = []
+    t = threading.Thread(target=lambda: other.append(gateway.db()))
+    t.start()
+    t.join()
+    assert other[0] is not conn
+
+
+def test_open_reader_does_not_block_worker_writes(tmp_path):
+    setup_temp_db(tmp_path)
+    job_id = gateway.insert_job("/videos/a.mp4")
+
+    reader = gateway._connect(gateway.DB_PATH)
+    reader.execute("BEGIN")
+    reader.execute("SELECT * FROM jobs").fetchall()
+    try:
+        started = time.monotonic()
+        gateway.set_status(job_id, "narrated")
+        assert time.monotonic() - started < 0.5
+    finally:
+        reader.rollback()
+        reader.close()
+    assert gateway.get_job(job_id)["status"] == "narrated"
+
+
+def test_jobs_keyset_pagination_and_status_filter(tmp_path):
+    setup_temp_db(tmp_path)
+    ids = [gateway.insert_job(f"/videos/{i}.mp4") for i in range(5)]
+    gateway.set_status(ids[1], "error")
+    client = TestClient(gateway.app)
+
+    r = client.get("/jobs", params={"limit": 2})
+    assert [j["id"] for j in r.json()] == [ids[4], ids[3]]
+    r = client.get("/jobs", params={"limit": 2, "cursor": r.headers["X-Next-Cursor"]})
+    assert [j["id"] for j in r.json()] == [ids[2], ids[1]]
+
+    r = client.get("/jobs", params={"status": "error,done"})
+    assert [j["id"] for j in r.json()] == [ids[1]]
+    assert "X-Next-Cursor" not in r.headers
+
+
+def test_jobs_since_cursor_returns_only_changes(tmp_path):
+    setup_temp_db(tmp_path)
+    ids = [gateway.insert_job(f"/videos/{i}.mp4") for i in range(3)]
+    client = TestClient(gateway.app)
+
+    cursor = client.get("/jobs").headers["X-Since-Cursor"]
+    r = client.get("/jobs", params={"since": cursor})
+    assert r.json() == []
+    assert r.headers["X-Since-Cursor"] == cursor
+
+    time.sleep(0.002)
+    gateway.set_status(ids[0], "narrated")
+    r = client.get("/jobs", params={"since": cursor})
+    assert [(j["id"], j["status"]) for j in r.json()] == [(ids[0], "narrated")]
+    assert client.get("/jobs", params={"since": r.headers["X-Since-Cursor"]}).json() == []
+
+    assert client.get("/jobs", params={"since": "garbage"}).status_code == 400
+
+
+def test_jobs_since_cursor_follows_commit_order_not_timestamps(tmp_path, monkeypatch):
+    setup_temp_db(tmp_path)
+    j1 = gateway.insert_job("/videos/1.mp4")
+    j2 = gateway.insert_job("/videos/2.mp4")
+    client = TestClient(gateway.app)
+    cursor = client.get("/jobs").headers["X-Since-Cursor"]
+
+    # Writer A horodate son UPDATE puis attend le verrou d'écriture tenu par B
+    writer_b = gateway._connect(gateway.DB_PATH)
+    writer_b.execute("BEGIN IMMEDIATE")
+    stamped = threading.Event()
+    real_now = gateway.now
+
+    def stamp():
+        ts = real_now()
+        stamped.set()
+        return ts
+
+    monkeypatch.setattr(gateway, "now", stamp)
+    writer_a = threading.Thread(target=gateway.set_status, args=(j1, "error"))
+    writer_a.start()
+    assert stamped.wait(5)
+    time.sleep(0.01)
+    # B commit avec un horodatage plus récent, puis reprend aussitôt le verrou
+    # pour que le poll ait lieu avant le commit de A
+    writer_b.execute("UPDATE jobs SET status = 'narrated', updated_at = ? WHERE id = ?", (real_now(), j2))
+    writer_b.commit()
+    writer_b.execute("BEGIN IMMEDIATE")
+
+    seen = {}
+    r = client.get("/jobs", params={"since": cursor})
+    seen.update((j["id"], j["status"]) for j in r.json())
+    cursor = r.headers["X-Since-Cursor"]
+
+    writer_b.rollback()
+    writer_b.close()
+    writer_a.join(5)
+    r = client.get("/jobs", params={"since": cursor})
+    seen.update((j["id"], j["status"]) for j in r.json())
+    assert seen == {j1: "error", j2: "narrated"}
+    assert gateway.get_job(j1)["updated_at"] < gateway.get_job(j2)["updated_at"]
+
+
+def test_jobs_since_cursor_interleaved_commit_is_not_skipped(tmp_path):
+    setup_temp_db(tmp_path)
+    j1 = gateway.insert_job("/videos/1.mp4")
+    j2 = gateway.insert_job("/videos/2.mp4")
+    client = TestClient(gateway.app)
+    cursor = client.get("/jobs").headers["X-Since-Cursor"]
+
+    # A prend son horodatage avant B mais commit après la lecture de B
+    early = gateway.now()
+    time.sleep(0.005)
+    gateway.set_status(j2, "narrated")
+    r = client.get("/jobs", params={"since": cursor})
+    assert [j["id"] for j in r.json()] == [j2]
+    cursor = r.headers["X-Since-Cursor"]
+
+    with gateway.db() as c:
+        c.execute("UPDATE jobs SET status = 'error', updated_at = ? WHERE id = ?", (early, j1))
+    r = client.get("/jobs", params={"since": cursor})
+    assert [(j["id"], j["status"]) for j in r.json()] == [(j1, "error")]
+
+
+def test_jobs_since_cursor_expires_after_events_are_pruned(tmp_path, monkeypatch):
+    setup_temp_db(tmp_path)
+    client = TestClient(gateway.app)
+    job_id = gateway.insert_job("/videos/1.mp4")
+    cursor = client.get("/jobs").headers["X-Since-Cursor"]
+    for status in ("narrating", "narrated", "building", "done"):
+        gateway.set_status(job_id, status)
+    monkeypatch.setattr(gateway, "JOB_EVENTS_RETENTION", 1)
+    gateway.prune_job_events()
+    assert client.get("/jobs", params={"since": cursor}).status_code == 410
+
+
+def test_jobs_status_queries_use_indexes(tmp_path):
+    setup_temp_db(tmp_path)
+    with gateway.db() as c:
+        def plan(sql, params):
+            return " ".join(r["detail"] for r in c.execute("EXPLAIN QUERY PLAN " + sql, params))
+
+        assert "idx_jobs_status_id" in plan(
+            "SELECT * FROM jobs WHERE status IN (?) AND id < ? ORDER BY id DESC LIMIT 50", ("error", 100)
+        )
+        assert "idx_jobs_status_updated" in plan(
+            "SELECT * FROM jobs WHERE status IN (?) AND (updated_at, id) > (?, ?) "
+            "ORDER BY updated_at ASC, id ASC LIMIT 50", ("done", "2025", 0)
+        )
+
+
+def test_job_event_stream_resumes_and_follows_transitions(tmp_path):
+    setup_temp_db(tmp_path)
+    job_id = gateway.insert_job("/videos/a.mp4")
+    gateway.claim_next("narrator")
+
+    async def scenario():
+        stream = gateway.job_event_stream(last_event_id=0)
+        assert await stream.__anext__() == "retry: 3000\n\n"
+        replayed = [await stream.__anext__() for _ in range(2)]
+
+        # A transition committed from another thread is pushed immediately
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        pending = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0.01)
+        await loop.run_in_executor(None, lambda: gateway.set_status(job_id, "narrated"))
+        live = await asyncio.wait_for(pending, 1)
+        await stream.aclose()
+        return replayed, live, time.monotonic() - started
+
+    replayed, live, elapsed = asyncio.run(scenario())
+
+    def parse(message):
+        lines = dict(line.split(": ", 1) for line in message.strip().split("\n"))
+        return int(lines["id"]), json.loads(lines["data"])
+
+    events = [parse(m) for m in replayed + [live]]
+    assert [e["status"] for _, e in events] == ["queued", "narrating", "narrated"]
+    assert all(e["job_id"] == job_id for _, e in events)
+    assert [i for i, _ in events] == sorted(i for i, _ in events)
+    assert elapsed < 0.5
+    assert gateway._stream_subscribers == set()
+
+
+def test_job_event_stream_reads_sqlite_off_the_event_loop(tmp_path, monkeypatch):
+    setup_temp_db(tmp_path)
+    on_loop = []
+
+    def running_on_loop():
+        try:
+            asyncio.get_running_loop()
+            return True
+        except RuntimeError:
+            return False
+
+    real_last, real_fetch = gateway.last_job_event_id, gateway.fetch_job_events
+    monkeypatch.setattr(gateway, "last_job_event_id", lambda: on_loop.append(running_on_loop()) or real_last())
+    monkeypatch.setattr(gateway, "fetch_job_events", lambda *a: on_loop.append(running_on_loop()) or real_fetch(*a))
+
+    async def scenario():
+        stream = gateway.job_event_stream()
+        await stream.__anext__()
+        pending = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0.01)
+        await asyncio.get_running_loop().run_in_executor(None, gateway.insert_job, "/videos/b.mp4")
+        assert "videos/b.mp4" in await asyncio.wait_for(pending, 1)
+        await stream.aclose()
+
+    asyncio.run(scenario())
+    assert len(on_loop) >= 2 and not any(on_loop)
+
+
+def test_stage_timings_are_stored_and_exposed_as_prometheus_metrics(tmp_path, monkeypatch):
+    setup_temp_db(tmp_path)
+    monkeypatch.setattr(gateway, "call_narrator", lambda file_path: {"title": "A"})
+    monkeypatch.setattr(gateway, "call_builder", lambda meta: {"post_id": 1, "link": "https://x/p"})
+    job_id = gateway.insert_job("/videos/a.mp4")
+    gateway.process_job("narrator", gateway.claim_next("narrator"))
+    gateway.process_job("builder", gateway.claim_next("builder"))
+
+    timings = json.loads(gateway.get_job(job_id)["timings"])
+    for key in ("narrator", "narrator_queue_wait", "builder", "builder_queue_wait", "end_to_end"):
+        assert timings[key] >= 0
+    assert timings["narrator_attempts"] == 1
+
+    r = TestClient(gateway.app).get("/metrics")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain")
+    body = r.text
+    assert "# TYPE gateway_stage_duration_seconds histogram" in body
+    assert 'gateway_stage_duration_seconds_bucket{stage="builder",outcome="ok",le="+Inf"}' in body
+    assert 'gateway_queue_wait_seconds_count{stage="narrator"}' in body
+    assert "gateway_job_end_to_end_seconds_count" in body
+    assert 'gateway_jobs{status="done"} 1' in body
+    assert 'gateway_outbox_messages{status="pending"} 2' in body
+
+
+def test_histogram_buckets_are_cumulative():
+    h = gateway.Histogram("t_seconds", "test", ("stage",), buckets=(1, 5))
+    for v in (0.5, 2, 10):
+        h.observe(v, "narrator")
+    lines = h.render()
+    assert 't_seconds_bucket{stage="narrator",le="1"} 1' in lines
+    assert 't_seconds_bucket{stage="narrator",le="5"} 2' in lines
+    assert 't_seconds_bucket{stage="narrator",le="+Inf"} 3' in lines
+    assert 't_seconds_sum{stage="narrator"} 12.500000' in lines
+
+
+def test_load_benchmark_runs_against_stub_downstreams():
+    from scripts.bench_gateway import run_benchmark
+
+    report = run_benchmark(
+        events=30, batch_size=10, narrator_latency="uniform:1-5", builder_latency="fixed:1",
+        publisher_latency="fixed:0", builder_errors=0.1, retry_base_sec=0.01, timeout=30
+    )
+    assert report["done"] == 30 and report["error"] == 0
+    assert report["jobs_per_sec"] > 0
+    assert report["stub_calls"]["builder"]["calls"] == 30 + report["stub_calls"]["builder"]["errors"]
+    assert report["outbox_sent"] == 60
+    assert report["end_to_end_sec"]["p50"] <= report["end_to_end_sec"]["p99"]
@@ -1,3 +1,23 @@
+function renderJobRow(job) {
+    const row = document.createElement('tr');
+    row.id = `job-${job.id}`;
+    
+    const fileName = job.file ? job.file.split('/').pop() : 'N/A';
+    const link = job.link 
+        ? `<a href="${job.link}" target="_blank" style="color: var(--primary)">Ouvrir</a>` 
+        : '-';
+    
+    row.innerHTML = `
+        <td>#${job.id}</td>
+        <td title="${job.file}">${fileName}</td>
+        <td><span class="job-status ${job.status}">${job.status}</span></td>
+        <td>${link}</td>
+        <td>${job.created_at || '-'}</td>
+        <td>${job.updated_at || '-'}</td>
+    `;
+    return row;
+}
+
 async function loadJobs() {
     try {
         const response = await fetch('/api/jobs?limit=100');
@@ -13,23 +33,7 @@ async function loadJobs() {
         tbody.innerHTML = '';
         
         jobs.forEach(job => {
-            const row = document.createElement('tr');
-            
-            const fileName = job.file ? job.file.split('/').pop() : 'N/A';
-            const link = job.link 
-                ? `<a href="${job.link}" target="_blank" style="color: var(--primary)">Ouvrir</a>` 
-                : '-';
-            
-            row.innerHTML = `
-                <td>#${job.id}</td>
-                <td title="${job.file}">${fileName}</td>
-                <td><span class="job-status ${job.status}">${job.status}</span></td>
-                <td>${link}</td>
-                <td>${job.created_at || '-'}</td>
-                <td>${job.updated_at || '-'}</td>
-            `;
-            
-            tbody.appendChild(row);
+            tbody.appendChild(renderJobRow(job));
         });
     } catch (error) {
         console.error('Erreur:', error);
@@ -42,8 +46,63 @@ function refreshJobs() {
     loadJobs();
 }
 
-// Auto-refresh toutes les 5 secondes
-setInterval(loadJobs, 5000);
+// Mise à jour en direct : chaque transition de statut arrive via SSE
+let reloadTimer = null;
+
+function scheduleReload() {
+    // Un lot de nouveaux jobs ne déclenche qu'un seul rechargement
+    if (!reloadTimer) {
+        reloadTimer = setTimeout(() => {
+            reloadTimer = null;
+            loadJobs();
+        }, 300);
+    }
+}
+
+function applyJobEvent(event) {
+    const data = JSON.parse(event.data);
+    const existing = document.getElementById(`job-${data.job_id}`);
+    
+    if (!existing) {
+        // Nouveau job : on recharge la liste
+        scheduleReload();
+        return;
+    }
+    
+    const cells = existing.querySelectorAll('td');
+    cells[2].innerHTML = `<span class="job-status ${data.status}">${data.status}</span>`;
+    if (data.link) {
+        cells[3].innerHTML = `<a href="${data.link}" target="_blank" style="color: var(--primary)">Ouvrir</a>`;
+    }
+    cells[5].textContent = data.created_at || '-';
+}
+
+let pollTimer = null;
+
+function startJobStream() {
+    if (!window.EventSource) {
+        pollTimer = setInterval(loadJobs, 5000);
+        return;
+    }
+    
+    const source = new EventSource('/api/jobs/stream');
+    source.addEventListener('job', applyJobEvent);
+    source.onopen = () => {
+        if (pollTimer) {
+            clearInterval(pollTimer);
+            pollTimer = null;
+        }
+    };
+    source.onerror = () => {
+        // Flux coupé : polling de secours jusqu'à la reconnexion automatique
+        if (!pollTimer) {
+            pollTimer = setInterval(loadJobs, 5000);
+        }
+    };
+}
 
-// Chargement initial
-document.addEventListener('DOMContentLoaded', loadJobs);
+// Chargement initial puis flux en direct
+document.addEventListener('DOMContentLoaded', () => {
+    loadJobs();
+    startJobStream();
+});
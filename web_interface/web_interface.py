@@ -1,8 +1,10 @@
 import os
+import httpx
 import requests
 from datetime import datetime  # ✅ FIX: Ajoute import
-from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse
+from typing import Optional
+from fastapi import FastAPI, Request, Response, HTTPException
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from dotenv import load_dotenv
@@ -106,10 +108,25 @@ async def check_services_status():
 
 
 @app.get("/api/jobs")
-async def get_jobs(limit: int = 50):
-    """Récupère la liste des jobs depuis le Gateway"""
+async def get_jobs(
+    response: Response,
+    limit: int = 50,
+    status: Optional[str] = None,
+    cursor: Optional[int] = None,
+    since: Optional[str] = None
+):
+    """Récupère la liste des jobs depuis le Gateway
+
+    Relaie les filtres et curseurs de pagination du Gateway (`status`,
+    `cursor`, `since`) ainsi que les en-têtes X-Next-Cursor / X-Since-Cursor.
+    """
+    params = {"limit": limit, "status": status, "cursor": cursor, "since": since}
     try:
-        r = requests.get(f"{GATEWAY_URL}/jobs?limit={limit}", timeout=10)
+        r = requests.get(
+            f"{GATEWAY_URL}/jobs",
+            params={k: v for k, v in params.items() if v is not None},
+            timeout=10
+        )
         r.raise_for_status()
         data = r.json()
         
@@ -119,12 +136,50 @@ async def get_jobs(limit: int = 50):
         if not isinstance(data, list):
             return []
         
+        for header in ("X-Next-Cursor", "X-Since-Cursor"):
+            if header in r.headers:
+                response.headers[header] = r.headers[header]
         return data
     except Exception as e:
         print(f"Error fetching jobs: {e}")
         return []
 
 
+@app.get("/api/jobs/stream")
+async def stream_jobs(request: Request, last_event_id: Optional[int] = None):
+    """Relaie le flux SSE des transitions de jobs du Gateway
+
+    Client HTTP asynchrone : un onglet Jobs ouvert n'occupe pas un thread du
+    threadpool pendant toute la durée de la connexion.
+    """
+    header = request.headers.get("last-event-id")
+    if header and header.isdigit():
+        last_event_id = int(header)
+    params = {"last_event_id": last_event_id} if last_event_id is not None else {}
+    client = httpx.AsyncClient(timeout=httpx.Timeout(60, connect=5))
+    try:
+        upstream = await client.send(
+            client.build_request("GET", f"{GATEWAY_URL}/jobs/stream", params=params), stream=True
+        )
+        upstream.raise_for_status()
+    except Exception as e:
+        await client.aclose()
+        print(f"Error opening jobs stream: {e}")
+        raise HTTPException(status_code=502, detail="Gateway stream unavailable")
+    
+    async def relay():
+        try:
+            async for chunk in upstream.aiter_raw():
+                yield chunk
+        finally:
+            await upstream.aclose()
+            await client.aclose()
+    
+    return StreamingResponse(
+        relay(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"}
+    )
+
+
 @app.post("/api/upload")
 async def upload_video(request: Request):
     """Créer un job via Gateway"""
@@ -276,7 +331,17 @@ async def create_curator_category(request: Request):
 async def sync_curator_videos():
     """Synchronise les vidéos depuis Bunny"""
     try:
-        r = requests.post(f"{CURATOR_URL}/sync/bunny", timeout=60)
+        r = requests.post(f"{CURATOR_URL}/sync/bunny", timeout=10)
+        return r.json()
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@app.get("/api/curator/sync/{sync_id}")
+async def curator_sync_status(sync_id: str):
+    """Progression d'une synchronisation Bunny"""
+    try:
+        r = requests.get(f"{CURATOR_URL}/sync/{sync_id}", timeout=10)
         return r.json()
     except Exception as e:
         return {"error": str(e)}